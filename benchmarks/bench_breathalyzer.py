@@ -0,0 +1,324 @@
+# benchmarks/bench_breathalyzer.py
+#
+# Concurrency and scale stress test of the Breathalyzer's drink storage.
+# Run from the repository root (no network needed):
+#
+#     python -m benchmarks.bench_breathalyzer
+#     python -m benchmarks.bench_breathalyzer --engines log --sizes 10 100000 --workers 16 --modes process
+#
+# Every scenario seeds a drink log of the given size in a throwaway directory and
+# lets --workers simulated sessions (threads or processes) click at the same
+# time: each operation adds a drink and reruns the page's data path. Two engines
+# are compared:
+#   log     the page's own add_drink / load_drinks / calculate_bac (pages/Breathalyzer.py)
+#   legacy  the original read-all/rewrite-all drinks.json store
+# For each scenario it reports throughput, p50/p99 latency of adds and reruns,
+# lost writes (drinks missing from the store afterwards) and corruption incidents
+# (unreadable files or lines). Results are written as JSON.
+
+import argparse
+import gzip
+import importlib.util
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_pages import REPO_ROOT
+
+DEFAULT_OUTPUT = os.path.join(REPO_ROOT, "benchmarks", "results", "breathalyzer.json")
+PROFILE = "bench"
+
+# Seeded drinks are spread over the two days before the run, long metabolized
+SEED_SPAN_S = 2 * 24 * 3600
+
+def load_page():
+    """
+    Imports pages/Breathalyzer.py as a module without running main().
+    """
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    spec = importlib.util.spec_from_file_location("breathalyzer_page", os.path.join(REPO_ROOT, "pages", "Breathalyzer.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+class LogEngine:
+    """
+    The current storage: per-profile JSON Lines log driven through the page functions.
+    """
+
+    name = "log"
+
+    def __init__(self):
+        self.page = load_page()
+
+    def path(self):
+        return self.page.profile_log(PROFILE).path
+
+    def seed(self, size):
+        path = self.path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        start = time.time() - SEED_SPAN_S
+        with open(path, "w") as f:
+            for i in range(size):
+                f.write(json.dumps({"type": "drink", "timestamp": round(start + i * SEED_SPAN_S / size, 3), "id": "beer"},
+                                   separators=(",", ":")) + "\n")
+
+    def add(self, session):
+        self.page.add_drink("beer", PROFILE)
+
+    def rerun(self, session):
+        drinks = self.page.load_drinks(PROFILE, cache=session)
+        self.page.calculate_bac(drinks)
+        self.page.compact_expired_drinks(drinks, PROFILE)
+
+    def settle(self):
+        for thread in threading.enumerate():
+            if thread.name == "drink-log-compaction":
+                thread.join()
+        self.page.profile_log(PROFILE).flush()  # process workers drain theirs at exit
+
+    def verify(self):
+        """
+        Counts the drinks in the log and its archive segments, read from scratch.
+        Returns (drinks, corruption incidents).
+        """
+        path = self.path()
+        drinks = corrupt = 0
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    corrupt += 1
+                    continue
+                if not line.endswith(b"\n"):
+                    corrupt += 1
+                drinks += event.get("type") == "drink"
+        archive_dir = os.path.splitext(path)[0] + ".archive"
+        for segment in sorted(os.listdir(archive_dir)) if os.path.isdir(archive_dir) else []:
+            if not segment.endswith(".jsonl.gz"):
+                continue
+            try:
+                with gzip.open(os.path.join(archive_dir, segment), "rb") as f:
+                    drinks += sum(json.loads(line).get("type") == "drink" for line in f)
+            except (OSError, EOFError, ValueError):
+                corrupt += 1
+        return drinks, corrupt
+
+class LegacyEngine:
+    """
+    The original storage: one drinks.json list, read whole and rewritten on every add.
+    Reproduced from the first version of pages/Breathalyzer.py.
+    """
+
+    name = "legacy"
+    path = "static/data/drinks.json"
+
+    def __init__(self):
+        self.decode_errors = 0
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r") as f:
+            try:
+                drinks = json.load(f)
+            except json.JSONDecodeError:
+                self.decode_errors += 1  # the original silently starts over from []
+                return []
+        return drinks if isinstance(drinks, list) else []
+
+    def save(self, drinks):
+        with open(self.path, "w") as f:
+            json.dump(drinks, f)
+
+    def seed(self, size):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        start = time.time() - SEED_SPAN_S
+        self.save([
+            {"timestamp": start + i * SEED_SPAN_S / size, "name": "Beer (25cl ~5%)", "volume_ml": 250,
+             "abv": 0.05, "image": "static/images/beer_light.jpg"}
+            for i in range(size)
+        ])
+
+    def add(self, session):
+        drinks = self.load()
+        drinks.append({"timestamp": time.time(), "name": "Beer (25cl ~5%)", "volume_ml": 250,
+                       "abv": 0.05, "image": "static/images/beer_light.jpg"})
+        self.save(drinks)
+
+    def rerun(self, session):
+        now = time.time()
+        total_bac = 0.0
+        for drink in self.load():
+            hours_elapsed = (now - drink["timestamp"]) / 3600.0
+            grams_alcohol = drink["volume_ml"] * drink["abv"] * 0.8
+            total_bac += max(0.0, grams_alcohol / (80.0 * 0.68) - 0.15 * hours_elapsed)
+
+    def settle(self):
+        pass
+
+    def verify(self):
+        try:
+            with open(self.path, "r") as f:
+                return len(json.load(f)), self.decode_errors
+        except (OSError, json.JSONDecodeError):
+            return 0, self.decode_errors + 1
+
+ENGINES = {"log": LogEngine, "legacy": LegacyEngine}
+
+def make_workdir():
+    """
+    Throwaway app directory with only what the storage needs (the drink catalog).
+    """
+    workdir = tempfile.mkdtemp(prefix="bench_breathalyzer_")
+    os.makedirs(os.path.join(workdir, "static", "data"))
+    shutil.copy2(os.path.join(REPO_ROOT, "static", "data", "drink_catalog.json"),
+                 os.path.join(workdir, "static", "data", "drink_catalog.json"))
+    return workdir
+
+def run_session(engine, ops, barrier):
+    """
+    One simulated session: `ops` times add a drink, then rerun the page's data path.
+    """
+    session = {}
+    timings = {"add": [], "rerun": [], "errors": 0}
+    barrier.wait()
+    timings["start"] = time.time()  # wall clock, comparable across processes
+    for _ in range(ops):
+        for op in ("add", "rerun"):
+            start = time.perf_counter()
+            try:
+                getattr(engine, op)(session)
+            except Exception:
+                timings["errors"] += 1
+                continue
+            timings[op].append(time.perf_counter() - start)
+    timings["end"] = time.time()
+    return timings
+
+def process_worker(engine_name, workdir, ops, barrier, results):
+    os.chdir(workdir)
+    engine = ENGINES[engine_name]()
+    timings = run_session(engine, ops, barrier)
+    timings["decode_errors"] = getattr(engine, "decode_errors", 0)
+    results.put(timings)
+
+def run_scenario(engine_name, size, mode, workers, ops):
+    workdir = make_workdir()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        engine = ENGINES[engine_name]()
+        engine.seed(size)
+
+        if mode == "thread":
+            barrier = threading.Barrier(workers)
+            sessions = []
+            threads = [threading.Thread(target=lambda: sessions.append(run_session(engine, ops, barrier)))
+                       for _ in range(workers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        else:
+            context = multiprocessing.get_context("spawn")
+            barrier = context.Barrier(workers)
+            results = context.Queue()
+            processes = [context.Process(target=process_worker, args=(engine_name, workdir, ops, barrier, results))
+                         for _ in range(workers)]
+            for process in processes:
+                process.start()
+            sessions = []
+            for _ in processes:
+                try:
+                    sessions.append(results.get(timeout=3600))
+                except queue.Empty:
+                    break
+            for process in processes:
+                process.join()
+            if hasattr(engine, "decode_errors"):
+                engine.decode_errors += sum(s.get("decode_errors", 0) for s in sessions)
+
+        engine.settle()
+        found, corrupt = engine.verify()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    adds = [t for s in sessions for t in s["add"]]
+    reruns = [t for s in sessions for t in s["rerun"]]
+    wall = max(s["end"] for s in sessions) - min(s["start"] for s in sessions) if sessions else 0.0
+    expected = size + len(adds)
+    return {
+        "engine": engine_name,
+        "log_size": size,
+        "mode": mode,
+        "workers": workers,
+        "ops_per_worker": ops,
+        "wall_s": wall,
+        "throughput_ops_s": (len(adds) + len(reruns)) / wall if wall else None,
+        "add_p50_s": percentile(adds, 0.5),
+        "add_p99_s": percentile(adds, 0.99),
+        "rerun_p50_s": percentile(reruns, 0.5),
+        "rerun_p99_s": percentile(reruns, 0.99),
+        "errors": sum(s["errors"] for s in sessions),
+        "expected_drinks": expected,
+        "found_drinks": found,
+        "lost_writes": max(0, expected - found),
+        "duplicate_writes": max(0, found - expected),
+        "corruption_incidents": corrupt,
+    }
+
+def print_table(results):
+    header = (f"{'engine':<8}{'size':>8}{'mode':>9}{'ops/s':>9}{'add p50':>10}{'add p99':>10}"
+              f"{'rerun p50':>11}{'rerun p99':>11}{'lost':>7}{'corrupt':>9}")
+    print(header)
+    print("-" * len(header))
+    ms = lambda s: f"{s * 1000:.1f}ms" if s is not None else "-"
+    for r in results:
+        print(
+            f"{r['engine']:<8}{r['log_size']:>8}{r['mode']:>9}{r['throughput_ops_s'] or 0:>9.0f}"
+            f"{ms(r['add_p50_s']):>10}{ms(r['add_p99_s']):>10}{ms(r['rerun_p50_s']):>11}{ms(r['rerun_p99_s']):>11}"
+            f"{r['lost_writes']:>7}{r['corruption_incidents']:>9}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress the Breathalyzer drink storage with concurrent sessions.")
+    parser.add_argument("--engines", nargs="+", choices=sorted(ENGINES), default=["log", "legacy"])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 100, 1000, 10000, 100000],
+                        help="Drinks in the log before the run")
+    parser.add_argument("--modes", nargs="+", choices=["thread", "process"], default=["thread", "process"])
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent sessions")
+    parser.add_argument("--ops", type=int, default=20, help="Add + rerun operations per session")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    results = []
+    for engine_name in args.engines:
+        for size in args.sizes:
+            for mode in args.modes:
+                print(f"{engine_name}: {size} drinks, {args.workers} {mode} workers ...", flush=True)
+                results.append(run_scenario(engine_name, size, mode, args.workers, args.ops))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"timestamp": time.time(), "python": sys.version.split()[0], "scenarios": results}, f, indent=2)
+    print_table(results)
+    print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
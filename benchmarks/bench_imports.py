@@ -0,0 +1,92 @@
+# benchmarks/bench_imports.py
+#
+# Import-time profile of every page, based on `python -X importtime`.
+# Run from the repository root:
+#
+#     python -m benchmarks.bench_imports
+#     python -m benchmarks.bench_imports pages/Sjoe.py --top 25
+#
+# Each page's module body (its imports and constants, not main()) is executed
+# in a fresh interpreter with streamlit already imported, so the numbers show
+# what the page itself adds on top of the framework when it is first opened.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.bench_pages import REPO_ROOT, discover_pages
+
+DEFAULT_OUTPUT = os.path.join(REPO_ROOT, "benchmarks", "results", "imports.json")
+
+# Executes a page module without running main(); streamlit is imported before the marker
+LOADER = """
+import sys, importlib.util
+import streamlit
+print("--- page imports ---", file=sys.stderr, flush=True)
+spec = importlib.util.spec_from_file_location("page_under_test", sys.argv[1])
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+"""
+
+def parse_importtime(stderr):
+    """
+    Parses -X importtime output after the marker line.
+    Returns (total_us, [(module, self_us, cumulative_us, depth)]).
+    """
+    lines = stderr.splitlines()
+    if "--- page imports ---" in lines:
+        lines = lines[lines.index("--- page imports ---") + 1:]
+    modules = []
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    # Top-level entries (depth 0 after the page's own indentation) add up to the total
+    min_depth = min((m[3] for m in modules), default=0)
+    total_us = sum(m[2] for m in modules if m[3] == min_depth)
+    return total_us, modules
+
+def profile_page(page, top):
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", LOADER, page],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    total_us, modules = parse_importtime(completed.stderr)
+    heaviest = sorted(modules, key=lambda m: m[2], reverse=True)[:top]
+    result = {
+        "page": page,
+        "total_ms": total_us / 1000.0,
+        "modules_imported": len(modules),
+        "heaviest": [{"module": m[0], "cumulative_ms": m[2] / 1000.0, "self_ms": m[1] / 1000.0} for m in heaviest],
+    }
+    if completed.returncode != 0:
+        result["error"] = completed.stderr.strip().splitlines()[-1:]
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the import time of each page.")
+    parser.add_argument("pages", nargs="*", help="Pages to profile (default: Start.py and all of pages/)")
+    parser.add_argument("--top", type=int, default=10, help="Heaviest imports to list per page")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    results = [profile_page(page, args.top) for page in args.pages or discover_pages()]
+
+    for result in results:
+        status = f"  ERROR {result['error']}" if "error" in result else ""
+        print(f"{result['page']}: {result['total_ms']:.1f} ms, {result['modules_imported']} modules{status}")
+        for module in result["heaviest"]:
+            print(f"    {module['cumulative_ms']:>8.1f} ms  {module['module']}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"python": sys.version.split()[0], "pages": results}, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
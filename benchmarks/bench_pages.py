@@ -0,0 +1,270 @@
+# benchmarks/bench_pages.py
+#
+# Per-page render benchmark, built on Streamlit's AppTest.
+# Run from the repository root:
+#
+#     python -m benchmarks.bench_pages
+#     python -m benchmarks.bench_pages --baseline benchmarks/baseline_pages.json
+#
+# Every page runs in its own fresh process, inside a throwaway copy of the
+# repository so state files (drinks, caches) are never touched. For each page
+# it reports cold (first run) and warm (rerun) wall time, the number of delta
+# messages and serialized ForwardMsg bytes sent to the browser, files read from
+# the app directory, and peak memory. Results are written as JSON; with
+# --baseline the run fails when a metric regresses beyond --threshold.
+
+import argparse
+import glob
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(REPO_ROOT, "benchmarks", "results", "pages.json")
+
+# What gets copied into the sandbox the pages run in
+SANDBOX_CONTENT = ["Start.py", "pages", "helpers", "static", ".streamlit"]
+
+# Metrics guarded by --baseline; lower is better for all of them
+GUARDED_METRICS = ["cold_s", "warm_median_s", "delta_messages", "payload_bytes", "file_reads"]
+
+def discover_pages():
+    """
+    Returns the entry script and every page module, relative to the repository root.
+    """
+    pages = sorted(
+        os.path.relpath(path, REPO_ROOT)
+        for path in glob.glob(os.path.join(REPO_ROOT, "pages", "*.py"))
+        if os.path.basename(path) != "__init__.py"
+    )
+    return ["Start.py"] + pages
+
+def make_sandbox():
+    """
+    Copies the app into a temporary directory and makes its cached API data fresh,
+    so no page needs the network.
+    """
+    sandbox = tempfile.mkdtemp(prefix="bench_pages_")
+    for name in SANDBOX_CONTENT:
+        source = os.path.join(REPO_ROOT, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(sandbox, name),
+                            ignore=shutil.ignore_patterns("__pycache__", "dist"))
+        elif os.path.isfile(source):
+            shutil.copy2(source, os.path.join(sandbox, name))
+
+    liege_cache = os.path.join(sandbox, "static", "data", "standard_liege_cache.json")
+    if os.path.isfile(liege_cache):
+        with open(liege_cache, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        data["timestamp"] = time.time()
+        with open(liege_cache, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    return sandbox
+
+class RunProbe:
+    """
+    Collects what one AppTest run sent and read: the ForwardMsgs handed to the
+    test runner and the files opened under the app directory.
+    """
+
+    def __init__(self, app_dir):
+        self.app_dir = app_dir
+        self.recording = False
+        self.file_reads = 0
+        self.messages = []
+        sys.addaudithook(self._audit)
+        self._patch_runner()
+
+    def _audit(self, event, args):
+        if not self.recording or event != "open":
+            return
+        path, mode = args[0], args[1]
+        if not isinstance(path, str) or (mode and any(c in str(mode) for c in "wax+")):
+            return
+        path = os.path.abspath(path)
+        if path.startswith(self.app_dir) and not path.endswith((".py", ".pyc")):
+            self.file_reads += 1
+
+    def _patch_runner(self):
+        from streamlit.testing.v1 import local_script_runner
+
+        probe = self
+        original = local_script_runner.LocalScriptRunner.forward_msgs
+
+        def forward_msgs(runner):
+            messages = original(runner)
+            probe.messages = list(messages)
+            return messages
+
+        local_script_runner.LocalScriptRunner.forward_msgs = forward_msgs
+
+    def run(self, app):
+        self.file_reads = 0
+        self.messages = []
+        self.recording = True
+        start = time.perf_counter()
+        try:
+            app.run()
+        finally:
+            elapsed = time.perf_counter() - start
+            self.recording = False
+        deltas = [m for m in self.messages if m.WhichOneof("type") == "delta"]
+        return {
+            "wall_s": elapsed,
+            "delta_messages": len(deltas),
+            "payload_bytes": sum(m.ByteSize() for m in self.messages),
+            "file_reads": self.file_reads,
+            "exceptions": [e.value for e in app.exception],
+        }
+
+def bench_page_worker(page, warm_runs):
+    """
+    Benchmarks a single page in the current process. Must run inside the sandbox.
+    """
+    sys.path.insert(0, os.getcwd())
+    from streamlit.testing.v1 import AppTest
+
+    probe = RunProbe(os.getcwd())
+    app = AppTest.from_file(os.path.abspath(page), default_timeout=60)
+    app.secrets["rapidapi_key"] = "benchmark"
+
+    cold = probe.run(app)
+    cold_peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    warm = [probe.run(app) for _ in range(warm_runs)]
+
+    tracemalloc.start()
+    app.run()
+    _, warm_peak_alloc = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    warm_times = [run["wall_s"] for run in warm]
+    # The rerun metrics come from the last warm run; without one they are not measured
+    not_measured = {"delta_messages": None, "payload_bytes": None, "file_reads": None, "exceptions": []}
+    last = warm[-1] if warm else not_measured
+    return {
+        "page": page,
+        "cold_s": cold["wall_s"],
+        "warm_median_s": statistics.median(warm_times) if warm_times else None,
+        "warm_min_s": min(warm_times) if warm_times else None,
+        "cold_delta_messages": cold["delta_messages"],
+        "cold_payload_bytes": cold["payload_bytes"],
+        "cold_file_reads": cold["file_reads"],
+        "delta_messages": last["delta_messages"],
+        "payload_bytes": last["payload_bytes"],
+        "file_reads": last["file_reads"],
+        "cold_peak_rss_kb": cold_peak_rss_kb,
+        "warm_peak_alloc_bytes": warm_peak_alloc,
+        "exceptions": cold["exceptions"] + last["exceptions"],
+    }
+
+def bench_page(page, warm_runs, sandbox):
+    """
+    Runs bench_page_worker for one page in a fresh interpreter, so the cold run
+    includes imports and process-level caches start empty.
+    """
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_pages", "--worker", page, "--warm-runs", str(warm_runs)],
+        cwd=sandbox,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        return {"page": page, "error": completed.stderr.strip().splitlines()[-1:]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def compare(results, baseline, threshold):
+    """
+    Returns a list of human-readable regressions against a baseline result file.
+    A page that failed to run or raised an exception is always a regression.
+    """
+    previous = {page["page"]: page for page in baseline.get("pages", [])}
+    regressions = []
+    for page in results["pages"]:
+        if "error" in page:
+            regressions.append(f"{page['page']}: failed to run: {' '.join(page['error']) or 'no output'}")
+            continue
+        if page.get("exceptions"):
+            regressions.append(f"{page['page']}: raised {'; '.join(page['exceptions'])}")
+        before = previous.get(page["page"])
+        if before is None:
+            continue
+        for metric in GUARDED_METRICS:
+            old, new = before.get(metric), page.get(metric)
+            # Not measured on either side (e.g. warm_median_s with --warm-runs 0), or nothing to scale from
+            if old is None or new is None or old == 0:
+                continue
+            if new > old * (1 + threshold):
+                regressions.append(f"{page['page']}: {metric} {old:.6g} -> {new:.6g} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+def print_table(results):
+    header = f"{'page':<24}{'cold s':>9}{'warm s':>9}{'deltas':>8}{'bytes':>10}{'reads':>7}{'rss MB':>8}"
+    print(header)
+    print("-" * len(header))
+    seconds = lambda s: f"{s:.3f}" if s is not None else "-"
+    count = lambda n: n if n is not None else "-"
+    for page in results["pages"]:
+        if "error" in page:
+            print(f"{page['page']:<24} ERROR {page['error']}")
+            continue
+        print(
+            f"{page['page']:<24}{seconds(page['cold_s']):>9}{seconds(page['warm_median_s']):>9}"
+            f"{count(page['delta_messages']):>8}{count(page['payload_bytes']):>10}{count(page['file_reads']):>7}"
+            f"{page['cold_peak_rss_kb'] / 1024:>8.0f}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark page renders with Streamlit's AppTest.")
+    parser.add_argument("pages", nargs="*", help="Pages to run (default: Start.py and all of pages/)")
+    parser.add_argument("--warm-runs", type=int, default=5)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", help="Earlier result file to guard against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed relative regression per metric (default 0.25 = +25%%)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(bench_page_worker(args.worker, args.warm_runs)))
+        return
+
+    sandbox = make_sandbox()
+    try:
+        results = {
+            "timestamp": time.time(),
+            "python": sys.version.split()[0],
+            "warm_runs": args.warm_runs,
+            "pages": [bench_page(page, args.warm_runs, sandbox) for page in args.pages or discover_pages()],
+        }
+    finally:
+        shutil.rmtree(sandbox, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print_table(results)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} of {args.baseline}")
+
+if __name__ == "__main__":
+    main()
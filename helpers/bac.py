@@ -0,0 +1,88 @@
+# helpers/bac.py
+#
+# Vectorized Blood Alcohol Content engine (Widmark formula), in promille.
+#
+# Each drink i, taken at t_i with g_i grams of alcohol, contributes
+#     c_i(t) = max(0, g_i / (weight * r) - METABOLISM_RATE * (t - t_i) / 3600)    for t >= t_i
+# and the BAC is the sum of the contributions. The whole curve is computed in
+# one NumPy pass over (drinks x time grid), and the moments the BAC drops below a
+# threshold are solved in closed form instead of being searched for.
+
+import numpy as np
+
+METABOLISM_RATE = 0.15  # g/L/hour (typical average)
+LEGAL_LIMIT = 0.5  # ‰, Belgian driving limit
+
+def drink_arrays(drinks, user_weight=80.0, distribution_ratio=0.68):
+    """
+    Returns (times, peaks): when each drink was taken (epoch seconds) and the
+    BAC it adds right away (‰). Drinks are resolved log entries with 'grams'.
+    """
+    times = np.fromiter((d["timestamp"] for d in drinks), dtype=float, count=len(drinks))
+    grams = np.fromiter((d["grams"] for d in drinks), dtype=float, count=len(drinks))
+    return times, grams / (user_weight * distribution_ratio)
+
+def bac_at(times, peaks, moments):
+    """
+    BAC at one or more moments (epoch seconds), as an array shaped like moments.
+    Only drinks that can still contribute at the earliest moment take part,
+    so a long history does not blow up the (drinks x moments) matrix.
+    """
+    moments = np.atleast_1d(np.asarray(moments, dtype=float))
+    if times.size == 0:
+        return np.zeros_like(moments)
+    active = peaks - METABOLISM_RATE * (moments.min() - times) / 3600.0 > 0
+    times, peaks = times[active], peaks[active]
+    elapsed = moments[None, :] - times[:, None]
+    contributions = np.clip(peaks[:, None] - METABOLISM_RATE * elapsed / 3600.0, 0.0, None)
+    contributions[elapsed < 0] = 0.0  # not drunk yet at that moment
+    return contributions.sum(axis=0)
+
+def bac_curve(times, peaks, start, end, points=200):
+    """
+    Returns (grid, values): the BAC sampled at `points` moments from start to end.
+    """
+    grid = np.linspace(start, end, points)
+    return grid, bac_at(times, peaks, grid)
+
+def time_below(times, peaks, threshold, now):
+    """
+    Returns the first moment from `now` on at which the BAC is at or below
+    `threshold` (epoch seconds), assuming no more drinks are taken.
+
+    After `now` every active drink decays linearly until it hits zero at
+    z_i = t_i + 3600 * peak_i / rate, so the BAC is piecewise linear and
+    non-increasing with breakpoints at the sorted z_i. Between breakpoints
+    B(t) = A_j - k_j * rate * t / 3600, with A_j and k_j suffix sums over the
+    drinks still active, which gives the crossing in closed form.
+    """
+    past = times <= now
+    times, peaks = times[past], peaks[past]
+    zero_at = times + 3600.0 * peaks / METABOLISM_RATE
+    active = zero_at > now
+    if not active.any():
+        return now
+    times, peaks, zero_at = times[active], peaks[active], zero_at[active]
+
+    order = np.argsort(zero_at)
+    zero_at = zero_at[order]
+    # c_i(t) = a_i - rate * t / 3600 while drink i is active
+    intercepts = (peaks + METABOLISM_RATE * times / 3600.0)[order]
+    suffix_a = np.cumsum(intercepts[::-1])[::-1]
+    suffix_k = np.arange(zero_at.size, 0, -1)
+
+    slope = METABOLISM_RATE / 3600.0
+    if suffix_a[0] - suffix_k[0] * slope * now <= threshold:
+        return now
+    # BAC just before each breakpoint, with the drinks from j on still active
+    before_break = suffix_a - suffix_k * slope * zero_at
+    j = int(np.argmax(before_break <= threshold)) if (before_break <= threshold).any() else zero_at.size - 1
+    return max(now, (suffix_a[j] - threshold) / (suffix_k[j] * slope))
+
+def active_since(times, peaks, now):
+    """
+    Returns the moment the oldest drink still in the blood at `now` was taken
+    (or `now` when there is none): every drink taken before it is fully metabolized.
+    """
+    active = times + 3600.0 * peaks / METABOLISM_RATE > now
+    return float(times[active].min()) if active.any() else now
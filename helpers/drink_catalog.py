@@ -0,0 +1,138 @@
+# helpers/drink_catalog.py
+#
+# The drinks the Breathalyzer knows about, read from static/data/drink_catalog.json:
+#
+#     {"drinks": [{"id": "beer", "name": "Beer (25cl ~5%)", "volume_ml": 250, "abv": 0.05,
+#                  "image": "static/images/beer_light.jpg", "featured": true}, ...]}
+#
+# Featured drinks get a button with their picture; the others are found through
+# search. The catalog is parsed once per process (again only when the file
+# changes) and the grams of alcohol of every entry are computed at load time,
+# so drink log events only need to carry the catalog ID and a timestamp.
+# Malformed entries are skipped with a warning instead of breaking the page.
+
+import json
+import logging
+import os
+import threading
+
+CATALOG_FILE = "static/data/drink_catalog.json"
+
+logger = logging.getLogger(__name__)
+
+# Grams of ethanol per ml
+ETHANOL_DENSITY = 0.8
+
+def alcohol_grams(volume_ml, abv):
+    return volume_ml * abv * ETHANOL_DENSITY
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _entry_problem(entry):
+    """
+    Returns why a catalog entry can't be used, or None if it is well-formed.
+    """
+    if not isinstance(entry, dict):
+        return "not an object"
+    for key in ("id", "name"):
+        if not isinstance(entry.get(key), str) or not entry[key]:
+            return f"missing or empty '{key}'"
+    for key in ("volume_ml", "abv"):
+        if not _is_number(entry.get(key)) or entry[key] < 0:
+            return f"missing or invalid '{key}'"
+    return None
+
+class DrinkCatalog:
+    """
+    Catalog entries by ID, each with its precomputed 'grams' of alcohol.
+    """
+
+    def __init__(self, entries):
+        self.entries = {}
+        self._ids_by_name = {}
+        for position, entry in enumerate(entries):
+            problem = _entry_problem(entry)
+            if problem is not None:
+                logger.warning("Skipping drink catalog entry %d: %s", position, problem)
+                continue
+            entry = dict(entry, grams=alcohol_grams(entry["volume_ml"], entry["abv"]))
+            self.entries[entry["id"]] = entry
+            self._ids_by_name[entry["name"]] = entry["id"]
+        # Lowercased "name id" per entry, the haystack of search()
+        self._search_text = [(f"{e['name']} {e['id']}".lower(), e) for e in self.entries.values()]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, drink_id):
+        return self.entries.get(drink_id)
+
+    def featured(self):
+        return [entry for entry in self.entries.values() if entry.get("featured")]
+
+    def search(self, query, limit=20):
+        """
+        Returns up to `limit` entries whose name or ID contains every word of the query.
+        """
+        words = query.lower().split()
+        matches = []
+        for text, entry in self._search_text:
+            if all(word in text for word in words):
+                matches.append(entry)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def key_for(self, name_or_id):
+        """
+        Maps a drink name from before the catalog to its ID; IDs and unknown names pass through.
+        """
+        return self._ids_by_name.get(name_or_id, name_or_id)
+
+    def resolve(self, event):
+        """
+        Expands a drink event into a full drink: the catalog entry plus the timestamp.
+        Events from before the catalog carry their own name, volume and ABV; those
+        are matched by name, or kept as they are when the catalog does not know them.
+        """
+        entry = self.entries.get(event.get("id")) or self.entries.get(self._ids_by_name.get(event.get("name")))
+        if entry is None:
+            volume_ml, abv = event.get("volume_ml", 0), event.get("abv", 0)
+            entry = {
+                "id": event.get("id") or event.get("name"),
+                "name": event.get("name") or event.get("id"),
+                "volume_ml": volume_ml,
+                "abv": abv,
+                "grams": alcohol_grams(volume_ml, abv),
+                "image": event.get("image"),
+            }
+        return dict(entry, timestamp=event["timestamp"])
+
+_catalog_lock = threading.Lock()
+_catalog_state = {"mtime": None, "catalog": DrinkCatalog([])}
+
+def get_catalog():
+    """
+    Returns the process-wide drink catalog, re-read only when the file changes.
+    """
+    try:
+        mtime = os.stat(CATALOG_FILE).st_mtime_ns
+    except OSError:
+        mtime = None
+    with _catalog_lock:
+        if mtime != _catalog_state["mtime"]:
+            entries = []
+            if mtime is not None:
+                try:
+                    with open(CATALOG_FILE, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except (ValueError, OSError) as e:
+                    logger.warning("Could not read the drink catalog %s: %s", CATALOG_FILE, e)
+                    data = {}
+                entries = data.get("drinks", []) if isinstance(data, dict) else []
+                if not isinstance(entries, list):
+                    logger.warning("Ignoring the drink catalog %s: 'drinks' is not a list", CATALOG_FILE)
+                    entries = []
+            _catalog_state.update(mtime=mtime, catalog=DrinkCatalog(entries))
+        return _catalog_state["catalog"]
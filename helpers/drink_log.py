@@ -0,0 +1,652 @@
+# helpers/drink_log.py
+#
+# Append-only JSON Lines event log behind the Breathalyzer.
+#
+# One event per line:
+#     {"type": "drink", "timestamp": 1735049397.512, "id": "beer"}
+#     {"type": "reset", "timestamp": 1735049400.1}
+#     {"type": "checkpoint", "timestamp": 1735049400.1, "active_from": ..., "summary": {...}}
+#
+# Drinks are referenced by their ID in the drink catalog (helpers/drink_catalog.py).
+# Logs from before the catalog hold full records (name, volume_ml, abv, image);
+# readers resolve both forms to the same catalog entries.
+#
+# Every write takes an exclusive lock, appends whole lines and fsyncs them, so a
+# click costs O(1) no matter how long the log is, and concurrent sessions (threads
+# or processes) can no longer lose each other's writes. A crash mid-write can at
+# worst leave a torn last line; it is trimmed before the next write and skipped
+# by readers, so the rest of the log is never lost. Lines that parse but are not
+# usable events (e.g. a drink without a numeric timestamp) are skipped with a warning.
+#
+# Drinks are written behind: append() applies the event to the in-memory summary
+# and index and returns right away, and a background thread writes the queued
+# events in one batch every FLUSH_INTERVAL seconds (sooner once FLUSH_BATCH are
+# queued). Readers in the process see queued events immediately; other processes
+# see them once flushed. Resets are written through, and a clean shutdown drains
+# the queue (atexit). A crash can lose at most the last FLUSH_INTERVAL of drinks.
+#
+# Next to the log (drinks.summary.json) a materialized summary is kept: drink
+# counts per catalog ID, total grams of alcohol and the last drink time since the last
+# reset. It is updated incrementally from the byte offset it has already covered,
+# so reading it costs a stat when nothing changed and only the new lines otherwise.
+#
+# The drinks since the last reset are indexed by timestamp in memory, again read
+# incrementally, so the active window (drinks that can still add to the BAC) is a
+# bisect away. Everything older is moved out of the log by compaction, in a
+# background thread: events before the last reset and fully metabolized drinks go
+# to a gzip archive segment (<name>.archive/), and the log is rewritten starting
+# with a checkpoint event that carries the summary of what was archived. The log,
+# and with it the cost of a rerun, then stays small however long it is in use.
+
+import atexit
+import bisect
+import copy
+import glob
+import gzip
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from helpers.drink_catalog import get_catalog
+from helpers.state_watch import current_session_id, mark_changed
+
+try:
+    import fcntl
+except ImportError:  # Windows: locking between threads of one process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Bumped when the summary format changes, so persisted summaries get rebuilt
+SUMMARY_VERSION = 2
+
+# Archivable events needed before a background compaction is worth it
+COMPACT_MIN_EVENTS = int(os.environ.get("DRINK_LOG_COMPACT_MIN_EVENTS", 50))
+
+# Write-behind: seconds between flushes (0 writes every drink through) and queue size forcing one
+FLUSH_INTERVAL = float(os.environ.get("DRINK_LOG_FLUSH_INTERVAL", 0.25))
+FLUSH_BATCH = int(os.environ.get("DRINK_LOG_FLUSH_BATCH", 64))
+
+class DrinkLog:
+    """
+    An append-only drink event log stored as JSON Lines.
+    Use get_drink_log() to share one instance per file across sessions.
+    """
+
+    def __init__(self, path, legacy_path=None):
+        self.path = path
+        # One path or several, tried in order: an older JSON Lines log or a JSON list
+        self.legacy_paths = (legacy_path,) if isinstance(legacy_path, str) else tuple(legacy_path or ())
+        self.lock_path = path + ".lock"
+        self.summary_path = os.path.splitext(path)[0] + ".summary.json"
+        self.archive_dir = os.path.splitext(path)[0] + ".archive"
+        self._thread_lock = threading.Lock()
+        self._ready = False
+
+        # In-memory summary and the log position (inode, byte offset) it covers
+        self._summary_lock = threading.Lock()
+        self._summary = None
+        self._summary_inode = None
+        self._summary_offset = 0
+
+        # Timestamp index of the drinks since the last reset, and the log position it covers
+        self._index_lock = threading.Lock()
+        self._index_inode = None
+        self._index_offset = 0
+        self._index_events = 0  # events read from the log
+        self._stale_events = 0  # of which up to the last reset, archivable as they are
+        self._times = []
+        self._drinks = []
+        # Drinks before this moment are fully metabolized (set by compaction)
+        self.active_from = 0.0
+        self._compacting = False
+
+        # Events applied in memory but not written yet, and the thread writing them
+        self._pending_lock = threading.Lock()
+        self._unflushed = []
+        # Sessions whose events are queued: they see them already, the others are woken after the flush
+        self._writers = set()
+        self._flush_wake = threading.Event()
+        self._flusher = None
+        # Bumped on every change of the in-memory summary or index, a cache key for views
+        self.generation = 0
+        # (inode, byte offset) of the unusable lines already warned about
+        self._warned_lines = set()
+
+    @contextmanager
+    def locked(self):
+        """
+        Exclusive lock on the log, across threads and processes.
+        """
+        with self._thread_lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.lock_path, "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def ensure_ready(self):
+        """
+        Creates the log on first use, migrating a legacy log if there is one.
+        """
+        if self._ready:
+            return
+        with self.locked():
+            if not os.path.exists(self.path):
+                self._migrate_legacy()
+            self._repair_tail()
+        self._ready = True
+
+    def _migrate_legacy(self):
+        """
+        One-time migration from the first legacy file that exists. An older JSON
+        Lines log is moved into place as is. The old read-all/rewrite-all JSON list
+        is converted: the new log is written to a temp file and renamed into place,
+        then the list is kept as <name>.migrated.
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        legacy_path = next((p for p in self.legacy_paths if os.path.isfile(p)), None)
+        if legacy_path is not None and legacy_path.endswith(".jsonl"):
+            os.replace(legacy_path, self.path)
+            return
+
+        drinks = []
+        if legacy_path is not None:
+            try:
+                with open(legacy_path, "r") as f:
+                    drinks = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                drinks = []
+            if not isinstance(drinks, list):
+                drinks = []
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for drink in drinks:
+                if isinstance(drink, dict) and "timestamp" in drink:
+                    f.write(encode_event(dict(drink, type="drink")))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        if legacy_path is not None:
+            os.replace(legacy_path, legacy_path + ".migrated")
+
+    def _repair_tail(self):
+        """
+        Trims a torn last line (no trailing newline) left by a crash mid-append.
+        Checking costs one seek and a 1-byte read; only an actual repair reads more.
+        """
+        if not os.path.exists(self.path):
+            open(self.path, "ab").close()
+            return
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            f.seek(0)
+            data = f.read()
+            f.truncate(data.rfind(b"\n") + 1)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, event):
+        """
+        Appends one event and returns the updated summary. The event is applied
+        in memory right away; drinks are then left to the background flusher (see
+        above), while other events, or every event when FLUSH_INTERVAL is 0, are
+        flushed durably before returning.
+        """
+        self.ensure_ready()
+        with self._summary_lock, self._index_lock:
+            if self._summary is None:
+                self._catch_up_summary()
+            if self._index_inode is None:
+                self._catch_up_index()
+            with self._pending_lock:
+                self._unflushed.append(event)
+                self._writers.add(current_session_id())
+                queued = len(self._unflushed)
+            apply_event(self._summary, event)
+            self._index_event(event)
+            self.generation += 1
+            summary = copy.deepcopy(self._summary)
+
+        if FLUSH_INTERVAL <= 0 or event.get("type") != "drink":
+            self.flush()
+        else:
+            self._start_flusher()
+            if queued >= FLUSH_BATCH:
+                self._flush_wake.set()
+        return summary
+
+    def flush(self):
+        """
+        Writes the queued events in one batch (lock, single write, fsync), then
+        wakes the sessions watching the log, except the ones that wrote the batch.
+        Returns the number of events written.
+        """
+        with self.locked():
+            with self._pending_lock:
+                batch = list(self._unflushed)
+                writers, self._writers = self._writers, set()
+            if not batch:
+                return 0
+            data = b"".join(encode_event(event) for event in batch)
+            self._repair_tail()
+            with open(self.path, "ab") as f:
+                with self._summary_lock, self._index_lock:
+                    # The batch is in memory already: read what other processes wrote
+                    # before it, then move both offsets past it instead of reading it back
+                    size_before = f.seek(0, os.SEEK_END)
+                    self._catch_up_summary(limit=size_before)
+                    self._catch_up_index(limit=size_before)
+                    f.write(data)
+                    f.flush()
+                    if self._summary_offset == size_before:
+                        self._summary_offset += len(data)
+                    if self._index_offset == size_before:
+                        self._index_offset += len(data)
+                    with self._pending_lock:
+                        del self._unflushed[:len(batch)]
+                os.fsync(f.fileno())
+            self._persist_summary()
+        mark_changed(self.path, skip=writers - {None})
+        return len(batch)
+
+    def _start_flusher(self):
+        with self._pending_lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name="drink-log-flusher", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        try:
+            while True:
+                self._flush_wake.wait(FLUSH_INTERVAL)
+                self._flush_wake.clear()
+                try:
+                    self.flush()
+                except Exception:
+                    # The events stay queued and the next round retries; the thread must not die
+                    logger.exception("Flushing %s failed", self.path)
+        finally:
+            # Should the thread die anyway, let the next append start a new one
+            with self._pending_lock:
+                if self._flusher is threading.current_thread():
+                    self._flusher = None
+
+    def summary(self):
+        """
+        Returns the summary of the drinks since the last reset:
+        {"counts": {drink_id: n}, "total_grams": g, "last_timestamp": t or None, "drinks": n}.
+        Only log lines appended since the previous call are read.
+        """
+        self.ensure_ready()
+        with self._summary_lock:
+            self._catch_up_summary()
+            return copy.deepcopy(self._summary)
+
+    def _has_unflushed(self):
+        with self._pending_lock:
+            return bool(self._unflushed)
+
+    def _reapply_unflushed(self, apply):
+        """
+        After (re)building in-memory state from the file, applies the events
+        that are only in memory so far.
+        """
+        with self._pending_lock:
+            unflushed = list(self._unflushed)
+        for event in unflushed:
+            apply(event)
+
+    def _catch_up_summary(self, limit=None):
+        """
+        Folds the log lines appended since the previous call, up to byte `limit`,
+        into the summary. Call with _summary_lock held.
+        """
+        stat = os.stat(self.path)
+        rebuilt = False
+        if self._summary is None:
+            self._load_persisted_summary(stat)
+            rebuilt = True
+        if stat.st_ino != self._summary_inode or stat.st_size < self._summary_offset:
+            # The log was replaced or truncated: rebuild from the start
+            self._summary, self._summary_inode, self._summary_offset = empty_summary(), stat.st_ino, 0
+            rebuilt = True
+        end = stat.st_size if limit is None else min(limit, stat.st_size)
+        if end > self._summary_offset and not rebuilt and self._has_unflushed():
+            # Other processes wrote lines that go before the events queued here, which
+            # are applied already (a reset among them would wipe them): rebuild in file order
+            self._load_persisted_summary(stat)
+            rebuilt = True
+        if self._summary_offset > end:
+            self._summary, self._summary_offset = empty_summary(), 0
+        if end > self._summary_offset:
+            with open(self.path, "rb") as f:
+                f.seek(self._summary_offset)
+                for line in f:
+                    if not line.endswith(b"\n") or self._summary_offset + len(line) > end:
+                        break  # torn or still being written, pick it up next time
+                    event = self._parse_line(line, stat.st_ino, self._summary_offset)
+                    self._summary_offset += len(line)
+                    if event is not None:
+                        apply_event(self._summary, event)
+                        self.generation += 1
+        if rebuilt:
+            self._reapply_unflushed(lambda event: apply_event(self._summary, event))
+            self.generation += 1
+
+    def _load_persisted_summary(self, stat):
+        """
+        Starts from the summary file if it describes this log, else from scratch.
+        """
+        self._summary, self._summary_inode, self._summary_offset = empty_summary(), stat.st_ino, 0
+        try:
+            with open(self.summary_path, "r") as f:
+                persisted = json.load(f)
+            if persisted.get("version") == SUMMARY_VERSION and persisted["inode"] == stat.st_ino and persisted["offset"] <= stat.st_size:
+                self._summary = persisted["summary"]
+                self._summary_offset = persisted["offset"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def _persist_summary(self):
+        """
+        Atomically writes the in-memory summary next to the log (temp file + rename).
+        It can always be rebuilt from the log, so no fsync is needed. Skipped while
+        events are queued, since the summary then covers more than the file.
+        """
+        with self._summary_lock:
+            with self._pending_lock:
+                if self._unflushed:
+                    return
+            persisted = {
+                "version": SUMMARY_VERSION,
+                "inode": self._summary_inode,
+                "offset": self._summary_offset,
+                "summary": self._summary,
+            }
+        tmp_path = self.summary_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(persisted, f)
+        os.replace(tmp_path, self.summary_path)
+
+    def _parse_line(self, line, inode, offset):
+        """
+        Returns the event of a complete log line, or None if it doesn't parse or
+        is not a usable event. The latter are logged, once per line.
+        """
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return None
+        problem = event_problem(event)
+        if problem is None:
+            return event
+        if (inode, offset) not in self._warned_lines:
+            self._warned_lines.add((inode, offset))
+            logger.warning("Skipping the line at byte %d of %s: %s", offset, self.path, problem)
+        return None
+
+    def events(self):
+        """
+        Returns every readable event of the log, oldest first. Lines that don't
+        parse (a torn tail being written right now) or are not usable events are skipped.
+        """
+        self.ensure_ready()
+        events = []
+        with open(self.path, "rb") as f:
+            inode, offset = os.fstat(f.fileno()).st_ino, 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                event = self._parse_line(line, inode, offset)
+                offset += len(line)
+                if event is not None:
+                    events.append(event)
+        return events
+
+    def _catch_up_index(self, limit=None):
+        """
+        Folds the log lines appended since the previous call, up to byte `limit`,
+        into the drink index. Call with _index_lock held.
+        """
+        stat = os.stat(self.path)
+        end = stat.st_size if limit is None else min(limit, stat.st_size)
+        rebuilt = False
+        if stat.st_ino != self._index_inode or stat.st_size < self._index_offset:
+            # The log was replaced (compacted) or truncated: rebuild from the start
+            rebuilt = True
+        elif end > self._index_offset and self._has_unflushed():
+            # Lines of other processes go before the events queued here: rebuild in file order
+            rebuilt = True
+        if rebuilt:
+            self._index_inode, self._index_offset = stat.st_ino, 0
+            self._index_events = self._stale_events = 0
+            self._times, self._drinks = [], []
+        if end > self._index_offset:
+            with open(self.path, "rb") as f:
+                f.seek(self._index_offset)
+                for line in f:
+                    if not line.endswith(b"\n") or self._index_offset + len(line) > end:
+                        break  # torn or still being written, pick it up next time
+                    event = self._parse_line(line, stat.st_ino, self._index_offset)
+                    self._index_offset += len(line)
+                    if event is not None:
+                        self._index_event(event)
+                        self.generation += 1
+        if rebuilt:
+            self._reapply_unflushed(self._index_event)
+            self.generation += 1
+
+    def _index_event(self, event):
+        """
+        Folds one event into the drink index. Call with _index_lock held.
+        """
+        self._index_events += 1
+        if event.get("type") == "reset":
+            self._times, self._drinks = [], []
+            self._stale_events = self._index_events
+        elif event.get("type") == "checkpoint":
+            self.active_from = max(self.active_from, event.get("active_from", 0.0))
+        elif event.get("type") == "drink":
+            # Appends arrive in time order, so this is nearly always a push at the end
+            position = bisect.bisect_right(self._times, event["timestamp"])
+            self._times.insert(position, event["timestamp"])
+            self._drinks.insert(position, get_catalog().resolve(event))
+
+    def drinks(self, since=None):
+        """
+        Returns the drinks logged since the last reset, oldest first, optionally
+        only those taken at or after `since` (epoch seconds). Each drink is its
+        catalog entry (id, name, volume_ml, abv, grams, image) plus the timestamp.
+        """
+        self.ensure_ready()
+        with self._index_lock:
+            self._catch_up_index()
+            start = bisect.bisect_left(self._times, since) if since is not None else 0
+            return self._drinks[start:]
+
+    def active_drinks(self):
+        """
+        Returns the drinks that may still add to the BAC: those since the last
+        reset that compaction has not marked as fully metabolized.
+        """
+        return self.drinks(since=self.active_from)
+
+    def schedule_compaction(self, before, min_events=COMPACT_MIN_EVENTS):
+        """
+        Marks the drinks taken before `before` as fully metabolized and, once at
+        least min_events events are archivable, compacts the log in a background
+        thread. Returns True if a compaction was started.
+        """
+        self.ensure_ready()
+        with self._index_lock:
+            self.active_from = max(self.active_from, before)
+            self._catch_up_index()
+            archivable = self._stale_events + bisect.bisect_left(self._times, before)
+            if archivable < min_events or self._compacting:
+                return False
+            self._compacting = True
+        threading.Thread(target=self._compact_in_background, args=(before,), name="drink-log-compaction", daemon=True).start()
+        return True
+
+    def _compact_in_background(self, before):
+        try:
+            self.compact(before)
+        except OSError:
+            pass  # Compaction is an optimization, the log stays valid without it
+        finally:
+            self._compacting = False
+
+    def compact(self, before):
+        """
+        Moves every event that no longer matters into a compressed archive segment:
+        all events up to the last reset and the drinks taken before `before`.
+        The log is rewritten (temp file + rename) as a checkpoint event holding
+        the summary of the archived drinks, followed by the events kept.
+        Returns the number of events archived.
+        """
+        self.ensure_ready()
+        self.flush()
+        with self.locked():
+            self._repair_tail()
+            events = self.events()
+            last_reset = max((i for i, event in enumerate(events) if event.get("type") == "reset"), default=-1)
+
+            archived, kept = [], []
+            checkpoint = empty_summary()
+            active_from = before
+            for i, event in enumerate(events):
+                if event.get("type") == "checkpoint":
+                    apply_event(checkpoint, event)
+                    active_from = max(active_from, event.get("active_from", 0.0))
+                elif i <= last_reset or (event.get("type") == "drink" and event["timestamp"] < before):
+                    apply_event(checkpoint, event)
+                    archived.append(event)
+                else:
+                    kept.append(event)
+            if not archived:
+                return 0
+
+            # The archive segment first: a crash before the rename below leaves the
+            # log untouched, and the retry overwrites the same segment
+            os.makedirs(self.archive_dir, exist_ok=True)
+            first = events[0].get("timestamp", 0)
+            segment = os.path.join(self.archive_dir, f"{int(first * 1000)}-{os.stat(self.path).st_ino}.jsonl.gz")
+            with open(segment + ".tmp", "wb") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                    for event in archived:
+                        f.write(encode_event(event))
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(segment + ".tmp", segment)
+
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(encode_event({
+                    "type": "checkpoint",
+                    "timestamp": archived[-1].get("timestamp", 0),
+                    "active_from": active_from,
+                    "summary": checkpoint,
+                }))
+                for event in kept:
+                    f.write(encode_event(event))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+            self.summary()
+            self._persist_summary()
+        return len(archived)
+
+    def archived_events(self):
+        """
+        Yields the archived events, segment by segment, oldest segment first.
+        """
+        for segment in sorted(glob.glob(os.path.join(self.archive_dir, "*.jsonl.gz")),
+                              key=lambda p: int(os.path.basename(p).split("-")[0])):
+            with gzip.open(segment, "rb") as f:
+                for line in f:
+                    yield json.loads(line)
+
+def event_problem(event):
+    """
+    Returns why a parsed log line can't be applied, or None if it is a usable event.
+    """
+    if not isinstance(event, dict):
+        return "not an object"
+    timestamp = event.get("timestamp")
+    if not isinstance(timestamp, (int, float)) or isinstance(timestamp, bool):
+        return "missing or non-numeric timestamp"
+    if event.get("type") == "checkpoint" and not isinstance(event.get("summary"), dict):
+        return "checkpoint without a summary"
+    return None
+
+def empty_summary():
+    return {"counts": {}, "total_grams": 0.0, "last_timestamp": None, "drinks": 0}
+
+def apply_event(summary, event):
+    """
+    Folds one log event into a summary, in place.
+    """
+    if event.get("type") == "reset":
+        summary.update(empty_summary())
+    elif event.get("type") == "checkpoint":
+        summary.update(copy.deepcopy(event["summary"]))
+        # Checkpoints written before the catalog count drinks by name
+        catalog = get_catalog()
+        counts = {}
+        for key, n in summary["counts"].items():
+            counts[catalog.key_for(key)] = counts.get(catalog.key_for(key), 0) + n
+        summary["counts"] = counts
+    elif event.get("type") == "drink":
+        drink = get_catalog().resolve(event)
+        summary["counts"][drink["id"]] = summary["counts"].get(drink["id"], 0) + 1
+        summary["total_grams"] += drink["grams"]
+        summary["last_timestamp"] = max(summary["last_timestamp"] or 0, event["timestamp"])
+        summary["drinks"] += 1
+
+def encode_event(event):
+    return (json.dumps(event, separators=(",", ":")) + "\n").encode("utf-8")
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+def flush_all():
+    """
+    Drains the write-behind queue of every log; registered to run at exit.
+    """
+    with _logs_lock:
+        logs = list(_logs.values())
+    for log in logs:
+        try:
+            log.flush()
+        except OSError:
+            pass
+
+atexit.register(flush_all)
+
+def get_drink_log(path, legacy_path=None):
+    """
+    Returns the process-wide DrinkLog for a file, so all sessions share its lock.
+    legacy_path is one path or a sequence of paths to migrate from (see DrinkLog).
+    """
+    with _logs_lock:
+        log = _logs.get(path)
+        if log is None:
+            log = _logs[path] = DrinkLog(path, legacy_path)
+        return log
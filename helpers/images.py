@@ -0,0 +1,268 @@
+# helpers/images.py
+
+import base64
+import json
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from helpers.metrics import timed
+from helpers.static_assets import asset_url, file_digest
+
+# Generated by scripts/build_images.py
+DERIVED_MANIFEST_FILE = "static/derived/manifest.json"
+
+# Memory ceiling for the rendered image tags, shared by all sessions of the process
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# mimetypes does not know .webp on every platform
+mimetypes.add_type("image/webp", ".webp")
+
+class ImageTagCache:
+    """
+    Process-wide LRU cache of rendered <img> tags with a byte budget.
+    Entries are keyed by (path, mtime, size, style params), so editing an image
+    on disk naturally misses and the stale entry ages out.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = len(value)
+        with self._lock:
+            if size > self.max_bytes:
+                return  # Too large to cache, serve it uncached
+            if key in self._entries:
+                self.current_bytes -= len(self._entries.pop(key))
+            self._entries[key] = value
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+_image_cache = ImageTagCache(IMAGE_CACHE_MAX_BYTES)
+
+def image_cache_stats():
+    """
+    Returns the hit/miss/eviction counters and memory use of the image tag cache.
+    """
+    return _image_cache.stats()
+
+_manifest_lock = threading.Lock()
+_manifest_state = {"mtime": None, "images": {}, "checked": {}}
+
+def load_image_manifest():
+    """
+    Returns the derived-image manifest, re-read only when the file changes.
+    """
+    try:
+        mtime = os.stat(DERIVED_MANIFEST_FILE).st_mtime_ns
+    except OSError:
+        mtime = None
+    with _manifest_lock:
+        if mtime != _manifest_state["mtime"]:
+            images = {}
+            if mtime is not None:
+                try:
+                    with open(DERIVED_MANIFEST_FILE, "r", encoding="utf-8") as f:
+                        images = json.load(f).get("images", {})
+                except (json.JSONDecodeError, OSError):
+                    images = {}
+            _manifest_state.update(mtime=mtime, images=images, checked={})
+        return _manifest_state
+
+def derived_variants(image_path: str):
+    """
+    Returns the manifest entry for an image if its derivatives are up to date,
+    i.e. were built from the current content of the source file. None otherwise.
+    """
+    manifest = load_image_manifest()
+    entry = manifest["images"].get(image_path)
+    if entry is None:
+        return None
+    stat = os.stat(image_path)
+    key = (image_path, stat.st_mtime_ns, stat.st_size)
+    fresh = manifest["checked"].get(key)
+    if fresh is None:
+        fresh = entry["source_digest"].startswith(file_digest(image_path))
+        fresh = fresh and all(os.path.isfile(v["path"]) for v in entry["variants"])
+        manifest["checked"][key] = fresh
+    return entry if fresh else None
+
+def derived_image_path(image_path: str, formats=("webp", "jpeg", "png")):
+    """
+    Returns the smallest up-to-date derivative at the highest density for an
+    image shown through st.image, or the original path if there is none.
+    st.image serves a single file, so only formats every browser decodes are considered.
+    """
+    entry = derived_variants(image_path)
+    if entry is None:
+        return image_path
+    candidates = [v for v in entry["variants"] if v["format"] in formats]
+    top_scale = max(v["scale"] for v in candidates)
+    return min((v for v in candidates if v["scale"] == top_scale), key=lambda v: v["bytes"])["path"]
+
+def static_serving_enabled():
+    """
+    True when Streamlit serves ./static at app/static (see .streamlit/config.toml).
+    """
+    try:
+        return bool(st.get_option("server.enableStaticServing"))
+    except RuntimeError:
+        return False
+
+def image_src(image_path: str):
+    """
+    Returns the src attribute for an image: its content-hashed static URL, or a
+    base64 data URI when static serving is turned off.
+    """
+    if static_serving_enabled():
+        return asset_url(image_path)
+
+    with open(image_path, "rb") as file:
+        base64_data = base64.b64encode(file.read()).decode("utf-8")
+    mime = mimetypes.guess_type(image_path)[0] or "image/png"
+    return f"data:{mime};base64,{base64_data}"
+
+@timed("images.embed_local_image")
+def embed_local_image(image_path: str, width=300, height=250, border_color="red"):
+    """
+    Returns an HTML img tag string for a local image.
+    The tag is memoized per (path, mtime, size, style params), so N sessions
+    rerunning the same page only build it once.
+    """
+    try:
+        stat = os.stat(image_path)
+    except OSError:
+        return f"<p style='color: white;'>Image not found: {image_path}</p>"
+
+    key = (image_path, stat.st_mtime_ns, stat.st_size, width, height, border_color)
+    html_img = _image_cache.get(key)
+    if html_img is not None:
+        return html_img
+
+    style = f"cursor: pointer; border: 3px solid {border_color}; width: {width}px; height: {height}px;"
+    entry = derived_variants(image_path)
+    if entry is not None and (entry["display_width"], entry["display_height"]) == (width, height):
+        html_img = picture_tag(entry, style)
+    else:
+        # Return the image tag without additional text
+        html_img = f"""
+    <img src="{image_src(image_path)}" loading="lazy" decoding="async" style="{style}" />
+    """
+    _image_cache.put(key, html_img)
+    return html_img
+
+def picture_tag(entry, style):
+    """
+    Builds a <picture> element from a manifest entry. Sources are ordered by
+    size, so the browser picks the smallest format it supports, and srcset
+    lets HiDPI screens take the 2x variant.
+    The tile paints immediately with the inlined blurred placeholder (or its
+    average colour) as background, while the real image loads lazily on top.
+    """
+    if entry.get("placeholder"):
+        style += f" background: url({entry['placeholder']}) center / cover no-repeat, {entry['color']};"
+    by_format = {}
+    for variant in entry["variants"]:
+        by_format.setdefault(variant["format"], []).append(variant)
+    fallback = sorted(by_format.pop(entry["fallback"]), key=lambda v: v["scale"])
+
+    if not static_serving_enabled():
+        # Without static serving only the 1x fallback is inlined, still far smaller than the original
+        return f"""
+    <img src="{image_src(fallback[0]["path"])}" decoding="async" style="{style}" />
+    """
+
+    def srcset(variants):
+        return ", ".join(f"{asset_url(v['path'])} {v['scale']}x" for v in sorted(variants, key=lambda v: v["scale"]))
+
+    sources = sorted(by_format.values(), key=lambda variants: min(v["bytes"] for v in variants))
+    source_tags = "".join(
+        f'<source type="{variants[0]["mime"]}" srcset="{srcset(variants)}" />' for variants in sources
+    )
+    return f"""
+    <picture>{source_tags}<img src="{asset_url(fallback[0]["path"])}" srcset="{srcset(fallback)}" loading="lazy" decoding="async" style="{style}" /></picture>
+    """
+
+def embed_animation(image_path: str, width=200):
+    """
+    Returns an HTML tag for an animated image (GIF) that prefers its animated WebP
+    derivative and shows the still poster frame until the animation has loaded.
+    The asset is only requested once this tag is rendered and, being served from a
+    content-hashed URL, stays in the browser cache for later unlocks.
+    """
+    try:
+        stat = os.stat(image_path)
+    except OSError:
+        return f"<p style='color: white;'>Image not found: {image_path}</p>"
+
+    key = ("animation", image_path, stat.st_mtime_ns, stat.st_size, width)
+    html_img = _image_cache.get(key)
+    if html_img is not None:
+        return html_img
+
+    entry = derived_variants(image_path)
+    if entry is None or not entry.get("animated"):
+        html_img = f'<img src="{image_src(image_path)}" style="width: {width}px;" />'
+        _image_cache.put(key, html_img)
+        return html_img
+
+    # Size the box from the derivatives' aspect ratio, so it has a height (and
+    # the poster shows) before the animation is decoded
+    first = min(entry["variants"], key=lambda v: v["scale"])
+    height = round(width * first["height"] / first["width"])
+    size = f'width="{width}" height="{height}"'
+    style = f"width: {width}px; height: auto; aspect-ratio: {first['width']} / {first['height']};"
+    if not static_serving_enabled():
+        smallest = min(entry["variants"], key=lambda v: v["bytes"])
+        html_img = f'<img src="{image_src(smallest["path"])}" {size} style="{style}" />'
+    else:
+        srcset = ", ".join(
+            f"{asset_url(v['path'])} {v['scale']}x" for v in sorted(entry["variants"], key=lambda v: v["scale"])
+        )
+        poster = asset_url(entry["poster"])
+        html_img = (
+            f'<picture><source type="image/webp" srcset="{srcset}" />'
+            f'<img src="{asset_url(image_path)}" {size} decoding="async" '
+            f'style="{style} background: url({poster}) center / cover no-repeat;" /></picture>'
+        )
+    _image_cache.put(key, html_img)
+    return html_img
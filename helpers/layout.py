@@ -0,0 +1,58 @@
+# helpers/layout.py
+
+from helpers.images import embed_local_image
+
+# Hide default Streamlit elements & set black background
+BLACK_PAGE_CSS = """
+    /* Hide hamburger menu & footer */
+    #MainMenu {visibility: hidden;}
+    footer {visibility: hidden;}
+
+    /* Hide the entire sidebar */
+    [data-testid="stSidebar"] {
+        display: none !important;
+    }
+
+    /* Make the background black */
+    .stApp {
+        background-color: black !important;
+    }
+
+    /* Remove margins/padding to ensure content is centered vertically */
+    .block-container {
+        padding-top: 2rem;
+        padding-bottom: 2rem;
+    }
+
+    /* 2-column grid of image links, meeting in the middle of the page */
+    .tile-grid {
+        display: grid;
+        grid-template-columns: 1fr 1fr;
+        gap: 1rem;
+        margin-bottom: 1rem;
+    }
+    .tile-grid > div:nth-child(odd) {
+        text-align: right;
+    }
+    .tile-grid > div:nth-child(even) {
+        text-align: left;
+    }
+"""
+
+def tile_grid_html(tiles, new_tab=False):
+    """
+    Returns the HTML of a 2-column grid of image links.
+    Args:
+        tiles: list of (image_path, href) tuples, filled row by row.
+        new_tab: open the links in a new browser tab.
+    """
+    target = ' target="_blank"' if new_tab else ""
+    cells = "".join(
+        f"""
+        <div>
+            <a href="{href}"{target} style='text-decoration: none;'>{embed_local_image(image_path)}</a>
+        </div>
+        """
+        for image_path, href in tiles
+    )
+    return f"<div class='tile-grid'>{cells}</div>"
@@ -0,0 +1,81 @@
+# helpers/live_clock.py
+
+import datetime
+import functools
+import os
+import time
+
+# The frontend is a single static HTML file, no build step needed
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "live_clock_frontend")
+
+@functools.lru_cache(maxsize=None)
+def _live_clock():
+    """
+    Declares the component on first use; importing streamlit.components costs
+    more than the rest of the landing page put together.
+    """
+    import streamlit.components.v1 as components
+
+    return components.declare_component("live_clock", path=FRONTEND_DIR)
+
+def _to_epoch_ms(moment: datetime.datetime):
+    """
+    Converts a datetime to epoch milliseconds. Naive datetimes are taken as local time,
+    which is how datetime.now() values are produced on the server.
+    """
+    return moment.timestamp() * 1000.0
+
+def _render(mode, reference, template, key, **kwargs):
+    return _live_clock()(
+        mode=mode,
+        reference_ms=_to_epoch_ms(reference),
+        server_now_ms=time.time() * 1000.0,
+        template=template,
+        # A stable key keeps the same iframe across reruns, so the clock never remounts
+        key=key or f"live_clock_{mode}",
+        default=None,
+        **kwargs,
+    )
+
+def live_age(dob: datetime.datetime, template="{value}", decimals=10, font_size=28, color="white",
+             align="center", key=None):
+    """
+    Shows the age since dob in decimal years, ticking in the browser.
+    The template's {value} placeholder is replaced by the formatted age.
+    Never calls back to Python.
+    """
+    return _render(
+        "age", dob, template, key,
+        decimals=decimals,
+        font_size=font_size,
+        color=color,
+        align=align,
+        bands=[],
+        notify_bands=False,
+        interval_ms=100,
+    )
+
+def live_elapsed(since: datetime.datetime, template="{value}", bands=None, notify_bands=False,
+                 font_size=16, align="left", key=None):
+    """
+    Shows the time elapsed since a moment as days/hours/minutes/seconds, ticking in the browser.
+
+    Args:
+        bands: list of dicts with 'name', 'from' and 'to' (seconds, 'to' may be None),
+               'kind' ('info', 'warning' or 'error') and 'text'. The band matching the
+               elapsed time is shown under the counter; {remaining} in its text is replaced
+               by the seconds left in the band.
+        notify_bands: when True, the component reruns the script with the new band name
+               as its value whenever the elapsed time crosses into another band.
+    Returns:
+        The name of the current band if notify_bands is set, otherwise None.
+    """
+    return _render(
+        "elapsed", since, template, key,
+        font_size=font_size,
+        color=None,
+        align=align,
+        bands=bands or [],
+        notify_bands=notify_bands,
+        interval_ms=1000,
+    )
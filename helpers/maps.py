@@ -0,0 +1,222 @@
+# helpers/maps.py
+#
+# Rendered Folium maps, cached per process.
+#
+#     map_iframe_tag(center, zoom, markers, width, height)  <iframe> of the interactive Leaflet page
+#     map_image_tag(center, zoom, markers, width, height)   static <img> of the same view, or None
+#
+# markers is a tuple of (lat, lon, tooltip, popup). Both renders are keyed by
+# (center, zoom, markers, size), so building the folium.Map and serializing its
+# HTML/JS happen once per process instead of on every rerun. With static serving
+# the renders are published as content-hashed files under static/dist/maps, so a
+# rerun only sends their URL and the browser keeps them cached. The URLs are
+# relative (app/static/...), like the other assets, so they also resolve under
+# a server.baseUrlPath.
+#
+# The static image is stitched from map tiles with Pillow, for clients that don't
+# need to pan or zoom (?map=static). It costs the browser one PNG instead of
+# Leaflet and its tiles. Both kinds of map take their tiles from the local tile
+# store (see helpers/tiles.py): the interactive one loads its export from
+# static/tiles, falling back to the public tiles outside the seeded area and
+# for tiles that fail to load, so it works offline wherever it was seeded.
+
+import base64
+import hashlib
+import html
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+
+from helpers.images import static_serving_enabled
+from helpers.metrics import timed
+from helpers.static_assets import DIST_DIR, STATIC_DIR, STATIC_URL_PREFIX
+from helpers.tiles import (
+    ATTRIBUTION,
+    TILE_SIZE,
+    UPSTREAM_URL,
+    get_tile,
+    seeded_tile_ranges,
+    static_tile_url,
+    tile_pixel,
+    tile_url,
+)
+
+# After a failed static render, serve the interactive map for this long before trying again
+MAP_RETRY_SECONDS = 300
+
+MAP_DIR = os.path.join(DIST_DIR, "maps")
+
+_maps = {}
+_maps_lock = threading.Lock()
+
+def _cached(kind, key, render):
+    """
+    Returns render() for the key, rendering only on the first call per process.
+    A render that returned None is retried after MAP_RETRY_SECONDS.
+    """
+    with _maps_lock:
+        entry = _maps.get((kind, key))
+    if entry is not None and (entry[1] is not None or time.time() - entry[0] < MAP_RETRY_SECONDS):
+        return entry[1]
+    value = render()
+    with _maps_lock:
+        _maps[(kind, key)] = (time.time(), value)
+    return value
+
+# Sends the tiles outside the seeded area, and those that fail to load, to the public tile server
+_TILE_FALLBACK_SCRIPT = """
+{% macro script(this, kwargs) %}
+    (function (layer, seeded, fallbackUrl) {
+        var localUrl = layer.getTileUrl;
+        function publicUrl(coords) {
+            return L.Util.template(fallbackUrl, {z: coords.z, x: coords.x, y: coords.y});
+        }
+        layer.getTileUrl = function (coords) {
+            var range = seeded[coords.z];
+            var inside = range && coords.x >= range[0] && coords.x <= range[1]
+                && coords.y >= range[2] && coords.y <= range[3];
+            return inside ? localUrl.call(this, coords) : publicUrl(coords);
+        };
+        layer.on("tileerror", function (e) {
+            if (!e.tile.dataset.fallback) {
+                e.tile.dataset.fallback = "1";
+                e.tile.src = publicUrl(e.coords);
+            }
+        });
+    })({{ this.layer.get_name() }}, {{ this.seeded }}, {{ this.fallback_url }});
+{% endmacro %}
+"""
+
+def _tile_fallback(layer):
+    """
+    A map element that makes the local tile layer fall back to the public tiles.
+    """
+    from branca.element import MacroElement
+    from jinja2 import Template
+
+    element = MacroElement()
+    element._template = Template(_TILE_FALLBACK_SCRIPT)
+    element.layer = layer
+    element.seeded = json.dumps(seeded_tile_ranges())
+    element.fallback_url = json.dumps(UPSTREAM_URL)
+    return element
+
+@timed("maps.build_map")
+def build_map(center, zoom, markers, tiles=None):
+    """
+    Creates the folium.Map with its markers, on the given local tile URL template
+    (falling back to the public tiles), or on the public OpenStreetMap tiles.
+    folium is by far the heaviest import of the site (~1s), so it is only
+    loaded when a map is rendered for the first time.
+    """
+    import folium
+
+    if tiles is None:
+        my_map = folium.Map(location=list(center), zoom_start=zoom)
+    else:
+        my_map = folium.Map(location=list(center), zoom_start=zoom, tiles=None)
+        layer = folium.TileLayer(tiles=tiles, attr=ATTRIBUTION).add_to(my_map)
+        my_map.add_child(_tile_fallback(layer))
+    for lat, lon, tooltip, popup in markers:
+        folium.Marker([lat, lon], tooltip=tooltip, popup=popup).add_to(my_map)
+    return my_map
+
+def map_iframe_tag(center, zoom, markers, width=700, height=500):
+    """
+    Returns an <iframe> tag of the interactive map: loading its published HTML
+    page, or carrying the HTML itself when static serving is turned off.
+    """
+    tiles = tile_url() or static_tile_url(MAP_DIR)
+    key = (tuple(center), zoom, tuple(markers), width, height, tiles)
+
+    def render():
+        page = build_map(center, zoom, markers, tiles).get_root().render()
+        if static_serving_enabled():
+            source = f'src="{_publish(page.encode("utf-8"), ".html")}"'
+        else:
+            source = f'srcdoc="{html.escape(page, quote=True)}"'
+        return f'<iframe {source} width="{width}" height="{height}" title="Map" style="border: none; max-width: 100%;"></iframe>'
+
+    return _cached("html", key, render)
+
+def map_image_tag(center, zoom, markers, width=700, height=500):
+    """
+    Returns an <img> tag of a static render of the map, or None if the tiles
+    could not be fetched (the caller then falls back to the interactive map).
+    """
+    key = (tuple(center), zoom, tuple(markers), width, height)
+    return _cached("image", key, lambda: _render_image_tag(center, zoom, markers, width, height))
+
+def fetch_tile(zoom, x, y):
+    """
+    Returns the PNG bytes of one tile from the tile store. Raises OSError if it is not available.
+    """
+    data = get_tile(zoom, x, y)
+    if data is None:
+        raise OSError(f"Tile {zoom}/{x}/{y} is not available")
+    return data
+
+@timed("maps.render_image")
+def render_image(center, zoom, markers, width, height):
+    """
+    Stitches the tiles around the center into a width x height PNG, with a pin
+    per marker and the tile attribution. Returns the PNG bytes.
+    """
+    from PIL import Image, ImageDraw
+
+    center_x, center_y = tile_pixel(center[0], center[1], zoom)
+    left, top = center_x - width / 2, center_y - height / 2
+    image = Image.new("RGB", (width, height), "#ddd")
+    tiles = 2 ** zoom
+    for tile_y in range(int(top // TILE_SIZE), int((top + height) // TILE_SIZE) + 1):
+        if not 0 <= tile_y < tiles:
+            continue
+        for tile_x in range(int(left // TILE_SIZE), int((left + width) // TILE_SIZE) + 1):
+            tile = Image.open(io.BytesIO(fetch_tile(zoom, tile_x % tiles, tile_y))).convert("RGB")
+            image.paste(tile, (round(tile_x * TILE_SIZE - left), round(tile_y * TILE_SIZE - top)))
+
+    draw = ImageDraw.Draw(image)
+    for lat, lon, _, _ in markers:
+        x, y = tile_pixel(lat, lon, zoom)
+        x, y = x - left, y - top
+        draw.polygon([(x, y), (x - 9, y - 18), (x + 9, y - 18)], fill="#2a81cb", outline="#185f9e")
+        draw.ellipse([x - 11, y - 34, x + 11, y - 12], fill="#2a81cb", outline="#185f9e")
+        draw.ellipse([x - 4, y - 27, x + 4, y - 19], fill="white")
+
+    text_width = draw.textlength(ATTRIBUTION)
+    draw.rectangle([width - text_width - 8, height - 16, width, height], fill="white")
+    draw.text((width - text_width - 4, height - 14), ATTRIBUTION, fill="#333")
+
+    out = io.BytesIO()
+    image.save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+def _publish(data, ext):
+    """
+    Writes a render to MAP_DIR under a content-hashed name, like the
+    published images, and returns its app/static URL.
+    """
+    path = os.path.join(MAP_DIR, f"map.{hashlib.sha256(data).hexdigest()[:12]}{ext}")
+    if not os.path.isfile(path):
+        os.makedirs(MAP_DIR, exist_ok=True)
+        # Write to a temp file and rename, so concurrent sessions never serve a partial copy
+        fd, tmp_path = tempfile.mkstemp(dir=MAP_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return f"{STATIC_URL_PREFIX}/{os.path.relpath(path, STATIC_DIR).replace(os.sep, '/')}"
+
+def _render_image_tag(center, zoom, markers, width, height):
+    try:
+        png = render_image(center, zoom, markers, width, height)
+    except (OSError, ValueError):
+        return None  # tiles not seeded and no network, or not an image
+
+    if static_serving_enabled():
+        src = _publish(png, ".png")
+    else:
+        src = "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+    return f'<img src="{src}" width="{width}" height="{height}" alt="Map" style="max-width: 100%; height: auto;" />'
@@ -0,0 +1,198 @@
+# helpers/metrics.py
+#
+# Lightweight timing instrumentation for the hot paths of the pages.
+#
+#     @timed("breathalyzer.load_drinks")
+#     def load_drinks(): ...
+#
+#     with span("sjoe.map"):
+#         ...
+#
+# Every span feeds a process-wide histogram (fixed buckets, count and sum),
+# which costs two clock reads and a short locked update per call.
+# Export is opt-in through environment variables:
+#   METRICS_PORT=9464            serve Prometheus text format at http://127.0.0.1:9464/metrics
+#   METRICS_FILE=metrics.json    rewrite a JSON snapshot at most every METRICS_FILE_INTERVAL seconds
+
+import atexit
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS_PORT = os.environ.get("METRICS_PORT")
+METRICS_FILE = os.environ.get("METRICS_FILE")
+METRICS_FILE_INTERVAL = float(os.environ.get("METRICS_FILE_INTERVAL", 30))
+
+class SpanHistogram:
+    """
+    Cumulative timing histogram of one span.
+    """
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)  # last one is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.bucket_counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum_s": self.total,
+            "mean_s": self.total / self.count if self.count else 0.0,
+            "max_s": self.max,
+            "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], self.bucket_counts)),
+        }
+
+_histograms = {}
+_lock = threading.Lock()
+_exporters_started = False
+_last_file_write = 0.0
+
+def record(name, seconds):
+    """
+    Adds one observation to the histogram of a span.
+    """
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = SpanHistogram()
+        histogram.observe(seconds)
+    if not _exporters_started:
+        start_exporters()
+    if METRICS_FILE and time.monotonic() - _last_file_write >= METRICS_FILE_INTERVAL:
+        write_json_snapshot()
+
+@contextmanager
+def span(name):
+    """
+    Times the enclosed block as the given span.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+def timed(name=None):
+    """
+    Decorator timing every call of a function as a span (default name: module.function).
+    """
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(span_name, time.perf_counter() - start)
+
+        return wrapper
+    return decorator
+
+def snapshot():
+    """
+    Returns a JSON-serializable copy of all span histograms.
+    """
+    with _lock:
+        return {name: histogram.to_dict() for name, histogram in sorted(_histograms.items())}
+
+def prometheus_text():
+    """
+    Renders all span histograms in the Prometheus text exposition format.
+    """
+    lines = [
+        "# HELP site_span_seconds Time spent in instrumented code paths.",
+        "# TYPE site_span_seconds histogram",
+    ]
+    with _lock:
+        for name, histogram in sorted(_histograms.items()):
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            cumulative = 0
+            for bound, bucket_count in zip([str(b) for b in BUCKETS] + ["+Inf"], histogram.bucket_counts):
+                cumulative += bucket_count
+                lines.append(f'site_span_seconds_bucket{{span="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'site_span_seconds_sum{{span="{label}"}} {histogram.total}')
+            lines.append(f'site_span_seconds_count{{span="{label}"}} {histogram.count}')
+    return "\n".join(lines) + "\n"
+
+def write_json_snapshot(path=None):
+    """
+    Atomically rewrites the JSON snapshot file (temp file + rename).
+    """
+    global _last_file_write
+    path = path or METRICS_FILE
+    _last_file_write = time.monotonic()
+    data = {"timestamp": time.time(), "pid": os.getpid(), "spans": snapshot()}
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # Metrics must never break a page
+
+def make_handler():
+    """
+    Builds the request handler of the /metrics endpoint. http.server is imported
+    here so pages that never export metrics don't pay for it.
+    """
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/metrics.json"):
+                self.send_error(404)
+                return
+            if self.path.startswith("/metrics.json"):
+                body = json.dumps(snapshot(), indent=2).encode("utf-8")
+                content_type = "application/json"
+            else:
+                body = prometheus_text().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Keep scrapes out of the Streamlit log
+
+    return MetricsHandler
+
+def start_exporters():
+    """
+    Starts the local /metrics endpoint if METRICS_PORT is set, and the final
+    JSON snapshot at exit if METRICS_FILE is set. Runs once per process.
+    """
+    global _exporters_started
+    with _lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    if METRICS_FILE:
+        atexit.register(write_json_snapshot)
+    if METRICS_PORT:
+        from http.server import ThreadingHTTPServer
+
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", int(METRICS_PORT)), make_handler())
+        except OSError:
+            return  # Port taken, e.g. by another Streamlit process on the same host
+        threading.Thread(target=server.serve_forever, name="metrics-endpoint", daemon=True).start()
@@ -0,0 +1,96 @@
+# helpers/profiles.py
+#
+# Per-user Breathalyzer profiles. Every profile has its own drink log and its own
+# Widmark parameters, so sessions of different users never contend on one file
+# and never read each other's drinks:
+#
+#     static/data/profiles/<shard>/<profile_id>.jsonl          drink log (helpers/drink_log.py)
+#     static/data/profiles/<shard>/<profile_id>.profile.json   {"weight_kg": 80.0, "distribution_ratio": 0.68}
+#
+# The shard is the first two hex digits of the SHA-1 of the profile ID, which
+# keeps every directory small however many profiles there are.
+
+import hashlib
+import json
+import os
+import re
+
+from helpers.drink_log import get_drink_log
+from helpers.state_watch import mark_changed, watch_file, watched_value
+
+PROFILES_DIR = "static/data/profiles"
+
+# The original single-user log lives on as the default profile
+DEFAULT_PROFILE = "co"
+LEGACY_LOG_FILES = ("static/data/drinks.jsonl", "static/data/drinks.json")
+
+DEFAULT_WEIGHT_KG = 80.0
+DEFAULT_DISTRIBUTION_RATIO = 0.68  # Widmark r, about 0.68 for men and 0.55 for women
+
+# Bounds of the settings. Compaction judges drinks metabolized with the lowest
+# ones (the slowest possible elimination), so no later change of the settings
+# can bring an archived drink back into the BAC.
+MIN_WEIGHT_KG, MAX_WEIGHT_KG = 30.0, 250.0
+MIN_DISTRIBUTION_RATIO, MAX_DISTRIBUTION_RATIO = 0.4, 0.9
+
+def normalize_profile_id(name):
+    """
+    Turns a free-form profile name into a safe file name: lowercase letters,
+    digits, '-' and '_', at most 40 characters. Empty names map to the default profile.
+    """
+    profile_id = re.sub(r"[^a-z0-9_-]+", "-", (name or "").strip().lower()).strip("-")[:40]
+    return profile_id or DEFAULT_PROFILE
+
+def profile_dir(profile_id):
+    shard = hashlib.sha1(profile_id.encode("utf-8")).hexdigest()[:2]
+    return os.path.join(PROFILES_DIR, shard)
+
+def profile_log(profile_id):
+    """
+    Returns the process-wide DrinkLog of a profile.
+    """
+    path = os.path.join(profile_dir(profile_id), profile_id + ".jsonl")
+    legacy = LEGACY_LOG_FILES if profile_id == DEFAULT_PROFILE else None
+    return get_drink_log(path, legacy_path=legacy)
+
+def profile_settings_path(profile_id):
+    return os.path.join(profile_dir(profile_id), profile_id + ".profile.json")
+
+def parse_profile(path):
+    """
+    Reads a settings file, falling back to the defaults for new profiles or unreadable
+    files. Values are clamped to the bounds above.
+    """
+    settings = {"weight_kg": DEFAULT_WEIGHT_KG, "distribution_ratio": DEFAULT_DISTRIBUTION_RATIO}
+    try:
+        with open(path, "r") as f:
+            stored = json.load(f)
+        settings["weight_kg"] = min(max(float(stored["weight_kg"]), MIN_WEIGHT_KG), MAX_WEIGHT_KG)
+        settings["distribution_ratio"] = min(max(float(stored["distribution_ratio"]), MIN_DISTRIBUTION_RATIO),
+                                             MAX_DISTRIBUTION_RATIO)
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return settings
+
+def load_profile(profile_id):
+    """
+    Returns the settings of a profile: {"weight_kg": ..., "distribution_ratio": ...},
+    from the in-memory copy kept by the file-watch service (see helpers/state_watch.py).
+    """
+    path = profile_settings_path(profile_id)
+    watch_file(path, parse_profile)
+    return dict(watched_value(path)[1])
+
+def save_profile(profile_id, weight_kg, distribution_ratio):
+    """
+    Atomically writes the settings of a profile (temp file + rename) and returns them.
+    """
+    settings = {"weight_kg": float(weight_kg), "distribution_ratio": float(distribution_ratio)}
+    path = profile_settings_path(profile_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(settings, f)
+    os.replace(tmp_path, path)
+    mark_changed(path)
+    return settings
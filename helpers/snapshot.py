@@ -0,0 +1,51 @@
+# helpers/snapshot.py
+
+import os
+import threading
+
+# Set SITE_SNAPSHOTS=0 to rebuild the static markup on every run (e.g. while editing a page)
+SNAPSHOTS_ENABLED = os.environ.get("SITE_SNAPSHOTS", "1") != "0"
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+def files_version(paths):
+    """
+    Returns a cheap version stamp, (path, mtime, size) per file, for a list of files.
+    Missing files are part of the stamp too, so creating them invalidates it.
+    """
+    version = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            version.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            version.append((path, None, None))
+    return tuple(version)
+
+def compact_html(html: str):
+    """
+    Joins the markup into one line. Besides being smaller, this keeps st.markdown from
+    ending the HTML block at a blank line or turning indented lines into code blocks.
+    """
+    return "".join(line.strip() for line in html.splitlines())
+
+def cached_snapshot(name: str, render, dependencies):
+    """
+    Returns the static HTML of a page, calling render() only when one of the
+    dependency files (page module, images, manifests) has changed since the
+    snapshot was taken. Snapshots are shared by all sessions of the process.
+    """
+    if not SNAPSHOTS_ENABLED:
+        return compact_html(render())
+
+    version = files_version(dependencies)
+    with _snapshots_lock:
+        snapshot = _snapshots.get(name)
+    if snapshot is not None and snapshot[0] == version:
+        return snapshot[1]
+
+    html = compact_html(render())
+    with _snapshots_lock:
+        _snapshots[name] = (version, html)
+    return html
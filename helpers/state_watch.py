@@ -0,0 +1,233 @@
+# helpers/state_watch.py
+#
+# Process-wide watch service for the shared state files (the drink logs, the
+# profile settings and sjoe_cache.json).
+#
+#     watch_file(path, parse)     keep parse(path) in memory, refreshed on change
+#     watched_value(path)         -> (version, value), no disk access
+#     mark_changed(path, skip)    after writing the file from this process
+#     subscribe(path)             rerun the current session when the file changes
+#
+# One watchdog observer per process gets change notifications for the watched
+# directories. Only then is the file parsed again and its version bumped, so a
+# rerun in steady state touches the disk not at all. Subscribed sessions (other
+# than the one that made the change) are then asked to rerun, so everyone sees
+# a new drink or text without having to interact.
+#
+# Without watchdog, or when the observer cannot start, watched_value() falls
+# back to a stat per call and re-parses when the file signature changes.
+#
+# Streamlit has no public API to rerun another session, so waking subscribers
+# goes through its internals (the session manager, the session state and the
+# server's event loop). That is only done on the Streamlit versions it was
+# checked against (PUSH_STREAMLIT_VERSIONS); on others a warning is logged and
+# sessions see changes on their next run (the Sjoe counter still polls through
+# its fragment timer).
+
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# (major, minor) Streamlit versions whose internals _wake_subscribers() was checked against
+PUSH_STREAMLIT_VERSIONS = {(1, 65)}
+
+class WatchedFile:
+    """
+    A parsed in-memory copy of one file, with a version bumped on every change.
+    """
+
+    def __init__(self, path, parse):
+        self.path = path
+        self.parse = parse
+        self.version = 0
+        self.value = None
+        self.signature = None
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def refresh(self, force=False):
+        """
+        Re-parses the file if its (inode, size, mtime) changed, or always with force.
+        Returns True if the copy was refreshed.
+        """
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            signature = None
+        with self.lock:
+            if signature == self.signature and not force:
+                return False
+            self.value = self.parse(self.path) if self.parse is not None else None
+            self.signature = signature
+            self.version += 1
+            return True
+
+_files = {}
+_files_lock = threading.Lock()
+_observer = None
+_watched_dirs = set()
+
+def _key(path):
+    return os.path.abspath(path)
+
+def watch_file(path, parse=None):
+    """
+    Starts watching a file, keeping parse(path) as its in-memory copy (or only a
+    version when parse is None). Returns the WatchedFile; calling it again for
+    the same path returns the existing one.
+    """
+    key = _key(path)
+    with _files_lock:
+        watched = _files.get(key)
+        if watched is not None:
+            return watched
+        watched = _files[key] = WatchedFile(path, parse)
+    watched.refresh(force=True)
+    _watch_directory(os.path.dirname(key))
+    return watched
+
+def _watch_directory(directory):
+    """
+    Schedules a directory on the process-wide observer, starting it on first use.
+    watchdog is imported here so pages that never watch anything don't pay for it.
+    """
+    global _observer
+    with _files_lock:
+        if directory in _watched_dirs:
+            return
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return
+        try:
+            if _observer is None:
+                _observer = Observer()
+                _observer.daemon = True
+                _observer.start()
+
+            class Handler(FileSystemEventHandler):
+                def on_any_event(self, event):
+                    for changed in (event.src_path, getattr(event, "dest_path", None)):
+                        if changed:
+                            _on_change(_key(os.fsdecode(changed)))
+
+            os.makedirs(directory, exist_ok=True)
+            _observer.schedule(Handler(), directory, recursive=False)
+        except OSError:
+            return  # e.g. out of inotify watches: watched_value() polls instead
+        _watched_dirs.add(directory)
+
+def _watching(watched):
+    return _observer is not None and _observer.is_alive() and os.path.dirname(_key(watched.path)) in _watched_dirs
+
+def _on_change(key):
+    watched = _files.get(key)
+    if watched is not None and watched.refresh():
+        _wake_subscribers(watched)
+
+def watched_value(path):
+    """
+    Returns (version, value) of a watched file. The version changes whenever the
+    file does, so it can key caches of anything derived from the file.
+    """
+    watched = _files.get(_key(path)) or watch_file(path)
+    if not _watching(watched):
+        watched.refresh()
+    return watched.version, watched.value
+
+def mark_changed(path, skip=()):
+    """
+    To be called after this process wrote a watched file: refreshes the copy
+    right away (the notification may take a moment) and wakes the other subscribers.
+    The current session and the sessions in `skip` (e.g. the writers, when the
+    write happens on a background thread) are not woken.
+    """
+    watched = _files.get(_key(path))
+    if watched is not None and watched.refresh():
+        _wake_subscribers(watched, skip)
+
+def current_session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+def subscribe(path):
+    """
+    Asks for the current session to rerun whenever the file changes.
+    Outside a Streamlit session this does nothing.
+    """
+    session_id = current_session_id()
+    if session_id is None:
+        return
+    watched = _files.get(_key(path)) or watch_file(path)
+    with watched.lock:
+        watched.subscribers.add(session_id)
+
+_push_state = {"supported": None, "warned": False}
+
+def _warn_push_disabled(reason):
+    if not _push_state["warned"]:
+        _push_state["warned"] = True
+        logger.warning("Pushing state changes to open sessions is disabled: %s", reason)
+
+def _push_supported():
+    """
+    True if the installed Streamlit is one _wake_subscribers() was checked against.
+    """
+    if _push_state["supported"] is None:
+        import streamlit
+        try:
+            version = tuple(int(part) for part in streamlit.__version__.split(".")[:2])
+        except ValueError:
+            version = None
+        _push_state["supported"] = version in PUSH_STREAMLIT_VERSIONS
+        if not _push_state["supported"]:
+            _warn_push_disabled(f"untested Streamlit version {streamlit.__version__} "
+                                f"(see PUSH_STREAMLIT_VERSIONS in helpers/state_watch.py)")
+    return _push_state["supported"]
+
+def _wake_subscribers(watched, skip=()):
+    """
+    Requests a rerun of every subscribed session, except the current one, those
+    in `skip` and the ones whose script is running right now. Sessions that are
+    gone are dropped.
+    """
+    try:
+        from streamlit.runtime import Runtime
+    except ImportError:
+        return  # not running under Streamlit
+    if not Runtime.exists() or not _push_supported():
+        return
+    try:
+        from streamlit.runtime.app_session import AppSessionState
+    except ImportError as e:
+        _warn_push_disabled(f"ImportError: {e}")
+        return
+    runtime = Runtime.instance()
+    skip = set(skip) | {current_session_id()}
+    with watched.lock:
+        subscribers = list(watched.subscribers)
+    try:
+        for session_id in subscribers:
+            if session_id in skip:
+                continue
+            info = runtime._session_mgr.get_active_session_info(session_id)
+            if info is None:
+                with watched.lock:
+                    watched.subscribers.discard(session_id)
+                continue
+            session = info.session
+            if session._state == AppSessionState.APP_IS_RUNNING:
+                continue
+            # AppSession is not thread-safe: hand the request to the server's event loop
+            runtime._get_async_objs().eventloop.call_soon_threadsafe(session.request_rerun, None)
+    except (AttributeError, RuntimeError) as e:
+        # Internals differ after all (or a test runtime): sessions see the change on their next run
+        _warn_push_disabled(f"{type(e).__name__}: {e}")
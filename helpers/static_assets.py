@@ -0,0 +1,54 @@
+# helpers/static_assets.py
+
+import hashlib
+import os
+import tempfile
+
+# Streamlit serves the ./static folder at app/static (see .streamlit/config.toml)
+STATIC_DIR = "static"
+STATIC_URL_PREFIX = "app/static"
+
+# Content-addressed copies of the assets are published here
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+DIGEST_LENGTH = 12
+
+def file_digest(path: str):
+    """
+    Returns a short SHA-256 hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:DIGEST_LENGTH]
+
+def publish_asset(path: str):
+    """
+    Copies a file into DIST_DIR under a content-hashed name (e.g. beer.3fa9c2d1e0b4.jpg)
+    and returns the path of the published copy.
+    Because the name changes whenever the content does, browsers can keep the
+    file cached forever and an edited image is picked up under a new URL.
+    """
+    stem, ext = os.path.splitext(os.path.basename(path))
+    target = os.path.join(DIST_DIR, f"{stem}.{file_digest(path)}{ext.lower()}")
+    if not os.path.isfile(target):
+        os.makedirs(DIST_DIR, exist_ok=True)
+        # Write to a temp file and rename, so concurrent sessions never serve a partial copy
+        fd, tmp_path = tempfile.mkstemp(dir=DIST_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out, open(path, "rb") as src:
+                out.write(src.read())
+            os.replace(tmp_path, target)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return target
+
+def asset_url(path: str):
+    """
+    Returns the app/static URL of the content-hashed copy of the given file.
+    """
+    published = publish_asset(path)
+    relative = os.path.relpath(published, STATIC_DIR).replace(os.sep, "/")
+    return f"{STATIC_URL_PREFIX}/{relative}"
@@ -0,0 +1,251 @@
+# helpers/text_history.py
+#
+# Bounded on-disk history of the "I've texted Sjoe" events, with rolling statistics.
+#
+# The history is a fixed-size ring buffer file (e.g. static/data/sjoe_history.bin):
+#
+#     header   magic (with the format version), capacity, texts ever, current and longest streak
+#     slots    `capacity` float64 timestamps; text i is stored in slot i % capacity
+#
+# It never grows: the last `capacity` texts are kept, and an append writes one
+# slot and the header however many texts came before.
+#
+# The statistics live in memory and are updated per text, not recomputed:
+#   gaps between texts (mean, median), time per warning band   over the texts in the ring
+#   current and longest streak                                  over all texts; kept in the header
+# A streak is a run of texts each sent less than streak_gap seconds after the
+# previous one; once streak_gap has passed without a text, stats(now) reports
+# the current streak as 0. The mean and the band times are running sums, the
+# median is taken from a sorted list of the gaps in the ring (a bisect and a list
+# insert or delete per text), so the cost per text and per render is bounded by
+# the ring's capacity, not by the number of texts ever sent.
+#
+# Other processes appending to the same file are noticed through the file-watch
+# service (helpers/state_watch.py) and caught up from the header's text count,
+# reading only the slots they wrote.
+
+import bisect
+import os
+import struct
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from helpers.state_watch import mark_changed, watch_file, watched_value
+
+try:
+    import fcntl
+except ImportError:  # Windows: locking between threads of one process only
+    fcntl = None
+
+MAGIC = b"TXTHIST1"
+HEADER = struct.Struct("<8sIQII")  # magic, capacity, texts ever, current streak, longest streak
+SLOT = struct.Struct("<d")
+
+DEFAULT_CAPACITY = 1024
+
+def _gap(earlier, later):
+    return max(0.0, later - earlier)
+
+class TextHistory:
+    """
+    A ring buffer of text timestamps on disk, with incrementally kept statistics.
+    Use get_text_history() to share one instance per file across sessions.
+    """
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, bands=(), streak_gap=None):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.capacity = capacity
+        # (name, from, to) per warning band, in seconds since the previous text; to=None is open-ended
+        self.bands = [(band["name"], band["from"], band["to"]) for band in bands]
+        self.streak_gap = streak_gap
+        self._thread_lock = threading.Lock()
+        self._version = None
+        self._reset()
+        watch_file(path)
+
+    def _reset(self):
+        self.total = 0
+        self.current_streak = 0
+        self.longest_streak = 0
+        self._times = deque()
+        self._gap_sum = 0.0
+        self._sorted_gaps = []
+        self._band_seconds = {name: 0.0 for name, _, _ in self.bands}
+
+    @contextmanager
+    def locked(self):
+        """
+        Exclusive lock on the history, across threads and processes.
+        """
+        with self._thread_lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.lock_path, "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _band_overlaps(self, gap):
+        for name, start, end in self.bands:
+            yield name, max(0.0, min(gap, end if end is not None else gap) - start)
+
+    def _count_gap(self, gap, sign):
+        self._gap_sum += sign * gap
+        if sign > 0:
+            bisect.insort(self._sorted_gaps, gap)
+        else:
+            del self._sorted_gaps[bisect.bisect_left(self._sorted_gaps, gap)]
+        for name, seconds in self._band_overlaps(gap):
+            self._band_seconds[name] += sign * seconds
+
+    def _apply(self, timestamp):
+        """
+        Folds one text into the statistics, dropping the oldest one once the ring is full.
+        Call with the lock held.
+        """
+        if self._times:
+            gap = _gap(self._times[-1], timestamp)
+            self._count_gap(gap, 1)
+            keeps_streak = self.streak_gap is None or gap < self.streak_gap
+            self.current_streak = self.current_streak + 1 if keeps_streak else 1
+        else:
+            self.current_streak += 1
+        self.longest_streak = max(self.longest_streak, self.current_streak)
+        self._times.append(timestamp)
+        if len(self._times) > self.capacity:
+            oldest = self._times.popleft()
+            self._count_gap(_gap(oldest, self._times[0]), -1)
+
+    def _read_header(self, f):
+        f.seek(0)
+        data = f.read(HEADER.size)
+        if len(data) < HEADER.size:
+            return None
+        magic, capacity, total, current, longest = HEADER.unpack(data)
+        return (capacity, total, current, longest) if magic == MAGIC and capacity > 0 else None
+
+    def _read_slots(self, f, first, last):
+        """
+        Returns the timestamps of texts first..last-1 (all still in the ring).
+        """
+        times = []
+        for i in range(first, last):
+            f.seek(HEADER.size + (i % self.capacity) * SLOT.size)
+            times.append(SLOT.unpack(f.read(SLOT.size))[0])
+        return times
+
+    def _sync(self):
+        """
+        Catches the in-memory state up with the file: applies only the texts
+        appended by other processes, or reloads the ring if too many were (or
+        the file was replaced). Call with the lock held.
+        """
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            self._reset()
+            return
+        with f:
+            header = self._read_header(f)
+            if header is None:
+                self._reset()
+                return
+            capacity, total, current, longest = header
+            if total == self.total and capacity == self.capacity:
+                return
+            if capacity != self.capacity or total < self.total or total - self.total >= capacity:
+                self._reset()
+                self.capacity = capacity
+                start = max(0, total - capacity)
+            else:
+                start = self.total
+            for timestamp in self._read_slots(f, start, total):
+                self._apply(timestamp)
+            self.total = total
+            # Streaks span texts that left the ring, only the header knows them
+            self.current_streak, self.longest_streak = current, longest
+
+    def _write(self, timestamp):
+        """
+        Writes a text into its slot, then the header that makes it count.
+        """
+        try:
+            f = open(self.path, "r+b")
+        except FileNotFoundError:
+            f = open(self.path, "w+b")
+            f.truncate(HEADER.size + self.capacity * SLOT.size)
+        with f:
+            f.seek(HEADER.size + (self.total % self.capacity) * SLOT.size)
+            f.write(SLOT.pack(timestamp))
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, self.capacity, self.total + 1, self.current_streak, self.longest_streak))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, timestamp):
+        """
+        Records a text at the given epoch time.
+        """
+        with self.locked():
+            self._sync()
+            self._apply(timestamp)
+            self._write(timestamp)
+            self.total += 1
+        mark_changed(self.path)
+
+    def stats(self, now=None):
+        """
+        Returns the statistics. With `now`, the time since the last text counts
+        towards the band times too, and a streak that streak_gap has passed on
+        is reported as broken (0); the header keeps it for the next append.
+        No file access unless the history changed.
+        """
+        version = watched_value(self.path)[0]
+        if version != self._version:
+            with self.locked():
+                self._version = version
+                self._sync()
+
+        with self._thread_lock:
+            gaps = self._sorted_gaps
+            middle = len(gaps) // 2
+            median = None
+            if gaps:
+                median = gaps[middle] if len(gaps) % 2 else (gaps[middle - 1] + gaps[middle]) / 2
+            # Running sums drift by float rounding as gaps leave the ring
+            band_seconds = {name: max(0.0, seconds) for name, seconds in self._band_seconds.items()}
+            current_streak = self.current_streak
+            if now is not None and self._times:
+                since_last = _gap(self._times[-1], now)
+                for name, seconds in self._band_overlaps(since_last):
+                    band_seconds[name] += seconds
+                if self.streak_gap is not None and since_last >= self.streak_gap:
+                    current_streak = 0
+            return {
+                "texts": self.total,
+                "in_window": len(self._times),
+                "last_text": self._times[-1] if self._times else None,
+                "mean_gap": self._gap_sum / len(gaps) if gaps else None,
+                "median_gap": median,
+                "current_streak": current_streak,
+                "longest_streak": self.longest_streak,
+                "band_seconds": band_seconds,
+            }
+
+_histories = {}
+_histories_lock = threading.Lock()
+
+def get_text_history(path, capacity=DEFAULT_CAPACITY, bands=(), streak_gap=None):
+    """
+    Returns the process-wide TextHistory for a file, so all sessions share its lock.
+    """
+    with _histories_lock:
+        history = _histories.get(path)
+        if history is None:
+            history = _histories[path] = TextHistory(path, capacity, bands, streak_gap)
+        return history
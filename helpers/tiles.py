@@ -0,0 +1,323 @@
+# helpers/tiles.py
+#
+# Local map tiles, so the maps load fast and keep working without the public
+# OpenStreetMap tile servers.
+#
+#     static/data/tiles.mbtiles   MBTiles (SQLite) tile store, pre-seeded by scripts/seed_tiles.py
+#     static/tiles/{z}/{x}/{y}.png  the store exported for Streamlit static serving (same script)
+#     get_tile(z, x, y)           PNG bytes: LRU cache -> tile store -> upstream (stored on the way)
+#     tile_url()                  Leaflet URL template of the local tile endpoint, or None
+#     static_tile_url(page_dir)   Leaflet URL template of the exported tiles, or None
+#
+# The static map renders (helpers/maps.py) read the store directly. The
+# interactive map loads the exported tiles from the site's own origin
+# (app/static/tiles/...), and only goes to the public tiles for those outside the
+# seeded area or missing from the export. Alternatively the store can be served
+# by a small threaded HTTP server started once per process, like the /metrics
+# one, serving /{z}/{x}/{y}.png from get_tile(); it has to be exposed under the
+# site's own origin (a reverse proxy path). Configuration:
+#   MAP_TILE_PUBLIC_URL=...      URL template the browsers use for the endpoint, e.g.
+#                                https://example.org/tiles/{z}/{x}/{y}.png; unset: the exported tiles
+#   MAP_TILE_PORT=8765           port of the endpoint
+#   MAP_TILE_HOST=127.0.0.1      address it binds to
+#   MAP_TILE_OFFLINE=1           never fetch missing tiles upstream, serve the store only
+#
+# Tiles are only ever fetched upstream (and stored) inside the seeded area,
+# LIMBURG_BBOX at LIMBURG_ZOOMS, so the endpoint can't be used as an open proxy
+# and the store can't grow without bound.
+
+import math
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import urllib.request
+
+from helpers.images import ImageTagCache, static_serving_enabled
+from helpers.static_assets import STATIC_DIR
+
+TILES_FILE = os.environ.get("MAP_TILES_FILE", "static/data/tiles.mbtiles")
+STATIC_TILES_DIR = os.path.join(STATIC_DIR, "tiles")
+TILE_SIZE = 256
+MAX_ZOOM = 19
+
+UPSTREAM_URL = os.environ.get("MAP_TILE_UPSTREAM", "https://tile.openstreetmap.org/{z}/{x}/{y}.png")
+UPSTREAM_TIMEOUT = 5.0
+ATTRIBUTION = "© OpenStreetMap contributors"
+
+# The OSM tile policy asks for an identifying User-Agent
+USER_AGENT = "streamlit-site-map/1.0"
+
+TILE_PORT = int(os.environ.get("MAP_TILE_PORT", 8765))
+TILE_HOST = os.environ.get("MAP_TILE_HOST", "127.0.0.1")
+TILE_PUBLIC_URL = os.environ.get("MAP_TILE_PUBLIC_URL")
+OFFLINE = os.environ.get("MAP_TILE_OFFLINE", "0") == "1"
+
+# Memory ceiling of the tiles kept in memory, shared by the endpoint and the static map renders
+TILE_CACHE_MAX_BYTES = int(os.environ.get("TILE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# The Sjoe map's neighbourhood: the province of Limburg, Belgium
+LIMBURG_BBOX = (50.68, 4.98, 51.38, 5.92)  # south, west, north, east
+LIMBURG_ZOOMS = range(8, 15)
+
+_tile_cache = ImageTagCache(TILE_CACHE_MAX_BYTES)
+_local = threading.local()
+_write_lock = threading.Lock()
+_server_lock = threading.Lock()
+_server_state = {"started": False, "available": False}
+
+def tile_pixel(lat, lon, zoom):
+    """
+    Web Mercator position of a coordinate, in pixels of the world map at the zoom level.
+    """
+    scale = TILE_SIZE * 2 ** zoom
+    x = (lon + 180.0) / 360.0 * scale
+    phi = math.radians(lat)
+    y = (1.0 - math.log(math.tan(phi) + 1.0 / math.cos(phi)) / math.pi) / 2.0 * scale
+    return x, y
+
+def bbox_tile_range(bbox, zoom):
+    """
+    Returns the (first x, last x, first y, last y) tiles covering a (south, west, north, east) box.
+    """
+    south, west, north, east = bbox
+    left, top = tile_pixel(north, west, zoom)
+    right, bottom = tile_pixel(south, east, zoom)
+    return int(left // TILE_SIZE), int(right // TILE_SIZE), int(top // TILE_SIZE), int(bottom // TILE_SIZE)
+
+def bbox_tiles(bbox, zoom):
+    """
+    Yields the (x, y) of every tile covering a (south, west, north, east) box.
+    """
+    first_x, last_x, first_y, last_y = bbox_tile_range(bbox, zoom)
+    for x in range(first_x, last_x + 1):
+        for y in range(first_y, last_y + 1):
+            yield x, y
+
+def seeded_tile_ranges():
+    """
+    Returns {zoom: (first x, last x, first y, last y)} of the seeded area, per seeded zoom level.
+    """
+    return {zoom: bbox_tile_range(LIMBURG_BBOX, zoom) for zoom in LIMBURG_ZOOMS}
+
+def in_seed_area(zoom, x, y):
+    """
+    True for the tiles of LIMBURG_BBOX at LIMBURG_ZOOMS, the only ones fetched upstream.
+    """
+    if zoom not in LIMBURG_ZOOMS:
+        return False
+    first_x, last_x, first_y, last_y = bbox_tile_range(LIMBURG_BBOX, zoom)
+    return first_x <= x <= last_x and first_y <= y <= last_y
+
+def open_store(path=None):
+    """
+    Opens (creating if needed) an MBTiles store. Rows are in the TMS scheme of
+    the MBTiles spec, i.e. tile_row counts from the bottom of the map.
+    """
+    path = path or TILES_FILE
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)"
+    )
+    connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row)")
+    connection.executemany(
+        "INSERT OR IGNORE INTO metadata (name, value) VALUES (?, ?)",
+        [("name", "OpenStreetMap"), ("format", "png"), ("type", "baselayer"), ("attribution", ATTRIBUTION)],
+    )
+    connection.commit()
+    return connection
+
+def _store():
+    """
+    The tile store connection of the current thread (SQLite connections are not shared).
+    """
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        connection = _local.connection = open_store()
+    return connection
+
+def read_tile(connection, zoom, x, y):
+    row = connection.execute(
+        "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+        (zoom, x, 2 ** zoom - 1 - y),
+    ).fetchone()
+    return bytes(row[0]) if row is not None else None
+
+def write_tile(connection, zoom, x, y, data):
+    connection.execute(
+        "INSERT OR REPLACE INTO tiles (zoom_level, tile_column, tile_row, tile_data) VALUES (?, ?, ?, ?)",
+        (zoom, x, 2 ** zoom - 1 - y, sqlite3.Binary(data)),
+    )
+    connection.commit()
+
+def export_static_tiles(connection, directory=STATIC_TILES_DIR):
+    """
+    Writes every tile of the store to directory/{z}/{x}/{y}.png, for Streamlit
+    static serving. Tiles already exported with the same size are skipped.
+    Returns the number of tiles written.
+    """
+    written = 0
+    rows = connection.execute("SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles")
+    for zoom, x, row, data in rows:
+        folder = os.path.join(directory, str(zoom), str(x))
+        path = os.path.join(folder, f"{2 ** zoom - 1 - row}.png")
+        if os.path.isfile(path) and os.path.getsize(path) == len(data):
+            continue
+        os.makedirs(folder, exist_ok=True)
+        # Write to a temp file and rename, so a browser never gets a partial tile
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        written += 1
+    return written
+
+def fetch_upstream(zoom, x, y):
+    """
+    Downloads one tile from the upstream tile server. Raises OSError on failure.
+    """
+    request = urllib.request.Request(UPSTREAM_URL.format(z=zoom, x=x, y=y), headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(request, timeout=UPSTREAM_TIMEOUT) as response:
+        return response.read()
+
+def get_tile(zoom, x, y):
+    """
+    Returns the PNG bytes of a tile, or None if it is not in the store and
+    can't be fetched (offline, outside the seeded area, or the upstream server failed).
+    Tiles fetched upstream are added to the store, so each is downloaded once.
+    """
+    key = (zoom, x, y)
+    data = _tile_cache.get(key)
+    if data is not None:
+        return data
+
+    try:
+        data = read_tile(_store(), zoom, x, y)
+    except sqlite3.Error:
+        data = None
+    if data is None:
+        if OFFLINE or not in_seed_area(zoom, x, y):
+            return None
+        try:
+            data = fetch_upstream(zoom, x, y)
+        except OSError:
+            return None
+        try:
+            with _write_lock:
+                write_tile(_store(), zoom, x, y, data)
+        except sqlite3.Error:
+            pass  # still serve it, it is fetched again next time
+    _tile_cache.put(key, data)
+    return data
+
+def tile_cache_stats():
+    """
+    Returns the hit/miss/eviction counters and memory use of the tile LRU cache.
+    """
+    return _tile_cache.stats()
+
+_TILE_PATH = re.compile(r"^/(\d+)/(\d+)/(\d+)\.png$")
+
+# Answers with the store it serves, so another process finding the port taken can tell it is a tile endpoint
+_IDENTITY_PATH = "/tile-store"
+
+def _identity():
+    return os.path.abspath(TILES_FILE).encode("utf-8")
+
+def make_handler():
+    """
+    Builds the request handler of the tile endpoint. http.server is imported
+    here so pages without a map don't pay for it.
+    """
+    from http.server import BaseHTTPRequestHandler
+
+    class TileHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == _IDENTITY_PATH:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.end_headers()
+                self.wfile.write(_identity())
+                return
+            match = _TILE_PATH.match(path)
+            if match is None:
+                self.send_error(404)
+                return
+            zoom, x, y = (int(group) for group in match.groups())
+            if zoom > MAX_ZOOM or x >= 2 ** zoom or y >= 2 ** zoom:
+                self.send_error(404)
+                return
+            data = get_tile(zoom, x, y)
+            if data is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("Cache-Control", "public, max-age=604800")
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # Keep tile requests out of the Streamlit log
+
+    return TileHandler
+
+def _serves_our_store():
+    """
+    True if the process holding the tile port is a tile endpoint serving the same store.
+    """
+    try:
+        with urllib.request.urlopen(f"http://{TILE_HOST}:{TILE_PORT}{_IDENTITY_PATH}", timeout=1.0) as response:
+            return response.read() == _identity()
+    except (OSError, ValueError):
+        return False
+
+def start_tile_server():
+    """
+    Starts the local tile endpoint on MAP_TILE_PORT. Runs once per process.
+    Returns False if there is no endpoint serving the store, e.g. when the port
+    is taken by something else.
+    """
+    with _server_lock:
+        if _server_state["started"]:
+            return _server_state["available"]
+        _server_state["started"] = True
+        _server_state["available"] = False
+        from http.server import ThreadingHTTPServer
+
+        try:
+            server = ThreadingHTTPServer((TILE_HOST, TILE_PORT), make_handler())
+        except OSError:
+            # Port taken: fine if it is another Streamlit process on the same host serving the same store
+            _server_state["available"] = _serves_our_store()
+            return _server_state["available"]
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="tile-endpoint", daemon=True).start()
+        _server_state["available"] = True
+        return True
+
+def tile_url():
+    """
+    Returns the {z}/{x}/{y} URL template the browsers load the tiles from:
+    MAP_TILE_PUBLIC_URL once the endpoint behind it runs, else None (public tiles).
+    """
+    if not TILE_PUBLIC_URL or not TILE_PORT or not start_tile_server():
+        return None
+    return TILE_PUBLIC_URL
+
+def static_tile_url(page_dir):
+    """
+    Returns the {z}/{x}/{y} URL template of the exported tiles, relative to a
+    page published in page_dir under the static folder, or None if static
+    serving is off or the tiles were never exported.
+    """
+    if not static_serving_enabled() or not os.path.isdir(STATIC_TILES_DIR):
+        return None
+    relative = os.path.relpath(STATIC_TILES_DIR, page_dir).replace(os.sep, "/")
+    return relative + "/{z}/{x}/{y}.png"
@@ -3,102 +3,231 @@
 import streamlit as st
 import time
 import os
-import json
 from datetime import datetime
 
-# Path to the drinks data file
-DATA_FILE = "static/data/drinks.json"
-
-def initialize_data_file():
+from helpers.bac import LEGAL_LIMIT, METABOLISM_RATE, active_since, bac_at, bac_curve, drink_arrays, time_below
+from helpers.drink_catalog import get_catalog
+from helpers.images import derived_image_path, embed_animation
+from helpers.metrics import timed
+from helpers.profiles import (
+    DEFAULT_PROFILE, MAX_DISTRIBUTION_RATIO, MAX_WEIGHT_KG, MIN_DISTRIBUTION_RATIO, MIN_WEIGHT_KG,
+    load_profile, normalize_profile_id, profile_log, save_profile,
+)
+from helpers.state_watch import subscribe, watch_file, watched_value
+
+# Rewards unlocked when a drink count hits a number, as (catalog ID, count) -> reward.
+# Every effect is played by the browser, so unlocking never holds up the run.
+#   effect: "balloons", "snow", "toast" (the message as a toast) or "animation" (a GIF, see helpers/images.py)
+REWARDS = {
+    ("beer", 3): {"effect": "balloons", "message": "You've unlocked: car keys! 🚗🔑"},
+    ("strong-beer", 2): {"effect": "snow", "message": "You've unlocked: car keys! 🚗🔑"},
+    ("shot", 3): {"effect": "toast", "message": "You've unlocked: Flight to Mexico! 🛫🏖️"},
+    ("wine", 3): {
+        "effect": "animation",
+        "animation": "static/images/wine_glass.gif",
+        "message": "You've unlocked: The closet! 🍷👩‍🎓",
+    },
+    ("cocktail", 2): {
+        "effect": "animation",
+        "animation": "static/images/cocktail_party.gif",
+        "message": "You've unlocked: The closet! 🍹👨‍🎓",
+    },
+}
+
+def watched_log(profile_id):
     """
-    Ensure that the data file exists. If not, create an empty list.
+    Returns the profile's drink log, registered with the file-watch service
+    (see helpers/state_watch.py) so its version is known without touching the disk.
     """
-    if not os.path.exists(DATA_FILE):
-        os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-        with open(DATA_FILE, 'w') as f:
-            json.dump([], f)
+    log = profile_log(profile_id)
+    log.ensure_ready()
+    watch_file(log.path)
+    return log
 
-def load_drinks():
+def cached_view(log, kind, read, cache):
+    """
+    Returns read(), reusing the copy in `cache` as long as the log is unchanged:
+    neither the file (its watched version) nor the drinks queued in memory.
     """
-    Load the list of drinks from the JSON file.
+    if cache is None:
+        return read()
+    version = (watched_value(log.path)[0], log.generation)
+    cached = cache.get((kind, log.path))
+    if cached is None or cached[0] != version:
+        cached = cache[(kind, log.path)] = (version, read())
+    return cached[1]
+
+@timed("breathalyzer.load_drink_state")
+def load_drink_state(profile_id=DEFAULT_PROFILE, cache=None):
+    """
+    Load what the page shows of a profile's log, in one read: its drink summary
+    and the drinks that may still be in the blood.
+    Args:
+        profile_id: whose log to read.
+        cache: optional dict (e.g. st.session_state) holding the last view of the log;
+            it is reused as long as the log has not changed.
     Returns:
-        List of drinks, where each drink is a dict with 'timestamp', 'name', 'volume_ml', 'abv'.
+        (summary, drinks). The summary is a dict with 'counts' (per catalog ID),
+        'total_grams', 'last_timestamp' and 'drinks'. The drinks are those since the
+        last reset, minus the ones compaction found fully metabolized; each is a
+        catalog entry ('id', 'name', 'volume_ml', 'abv', 'grams', 'image') with the
+        'timestamp' it was taken.
     """
-    initialize_data_file()
-    with open(DATA_FILE, 'r') as f:
-        try:
-            drinks = json.load(f)
-            # Validate that drinks is a list
-            if not isinstance(drinks, list):
-                drinks = []
-        except json.JSONDecodeError:
-            drinks = []
-    return drinks
+    log = watched_log(profile_id)
+    return cached_view(log, "state", lambda: (log.summary(), log.active_drinks()), cache)
 
-def save_drinks(drinks):
+def load_drinks(profile_id=DEFAULT_PROFILE, cache=None):
     """
-    Save the list of drinks to the JSON file.
+    Load the drinks of a profile that may still be in the blood (see load_drink_state()).
     """
-    with open(DATA_FILE, 'w') as f:
-        json.dump(drinks, f)
+    return load_drink_state(profile_id, cache)[1]
 
-def add_drink(drink_info):
+@timed("breathalyzer.add_drink")
+def add_drink(drink_id, profile_id=DEFAULT_PROFILE):
     """
-    Add a new drink to the drinks list and save it.
+    Append a new drink to the profile's log.
     Args:
-        drink_info: dict with 'name', 'volume_ml', 'abv', 'image'.
+        drink_id: ID of the drink in the catalog (static/data/drink_catalog.json).
+    Returns:
+        The updated drink summary.
+    """
+    log = watched_log(profile_id)
+    # Queued in memory and written by the log's background flusher, which then
+    # wakes the other sessions watching the log (not this one)
+    return log.append({
+        "type": "drink",
+        "timestamp": round(time.time(), 3),
+        "id": drink_id
+    })
+
+def reset_drinks(profile_id=DEFAULT_PROFILE):
+    """
+    Reset the profile's drinks by appending a reset marker to its log.
+    Returns:
+        The updated (empty) drink summary.
     """
-    drinks = load_drinks()
-    drink_entry = {
-        "timestamp": time.time(),
-        "name": drink_info["name"],
-        "volume_ml": drink_info["volume_ml"],
-        "abv": drink_info["abv"],
-        "image": drink_info["image"]
-    }
-    drinks.append(drink_entry)
-    save_drinks(drinks)
+    log = watched_log(profile_id)
+    # Resets are written through, waking the other sessions
+    return log.append({"type": "reset", "timestamp": time.time()})
 
-def reset_drinks():
+def compact_expired_drinks(drinks, profile_id=DEFAULT_PROFILE):
     """
-    Reset the drinks list by clearing the JSON file.
+    Hands the fully metabolized drinks of a profile to background compaction
+    (see helpers/drink_log.py), so its log stays small. Archived drinks no longer
+    count towards the BAC, so "metabolized" is judged with the lowest weight and
+    ratio the profile can be set to, not the current ones.
     """
-    save_drinks([])
+    times, peaks = drink_arrays(drinks, MIN_WEIGHT_KG, MIN_DISTRIBUTION_RATIO)
+    profile_log(profile_id).schedule_compaction(active_since(times, peaks, time.time()))
 
+def select_profile():
+    """
+    Profile picker and settings at the top of the page. The profile is kept in
+    the URL (?profile=...), so a bookmark opens the same profile.
+    Returns:
+        (profile_id, settings) with settings as in helpers/profiles.py.
+    """
+    if "profile" not in st.session_state:
+        st.session_state["profile"] = st.query_params.get("profile", DEFAULT_PROFILE)
+    profile_id = normalize_profile_id(st.text_input("Profile", key="profile"))
+    if profile_id != st.query_params.get("profile", DEFAULT_PROFILE):
+        st.query_params["profile"] = profile_id
+
+    settings = load_profile(profile_id)
+    with st.expander("Weight & body"):
+        weight = st.number_input(
+            "Weight (kg)", min_value=MIN_WEIGHT_KG, max_value=MAX_WEIGHT_KG, step=1.0,
+            value=settings["weight_kg"], key=f"weight_{profile_id}"
+        )
+        ratio = st.number_input(
+            "Distribution ratio (Widmark r)", min_value=MIN_DISTRIBUTION_RATIO, max_value=MAX_DISTRIBUTION_RATIO, step=0.01,
+            value=settings["distribution_ratio"], key=f"ratio_{profile_id}",
+            help="About 0.68 for men and 0.55 for women."
+        )
+    if (weight, ratio) != (settings["weight_kg"], settings["distribution_ratio"]):
+        settings = save_profile(profile_id, weight, ratio)
+    return profile_id, settings
+
+@timed("breathalyzer.calculate_bac")
 def calculate_bac(drinks, user_weight=80.0, distribution_ratio=0.68):
     """
-    Widmark formula to calculate total Blood Alcohol Content (g/L or ‰) over time
-    for each consumed drink.
+    Widmark formula to calculate total Blood Alcohol Content (g/L or ‰) right now
+    for each consumed drink (see helpers/bac.py).
     """
-    now = time.time()
-    metabolism_rate = 0.15  # g/L/hour (typical average)
-
-    total_bac = 0.0
-
-    for drink in drinks:
-        drink_time = drink["timestamp"]
-        volume_ml = drink["volume_ml"]
-        abv = drink["abv"]
-
-        # Time difference in hours since that drink
-        hours_elapsed = (now - drink_time) / 3600.0
-
-        # Grams of pure alcohol in this drink
-        grams_alcohol = volume_ml * abv * 0.8
+    times, peaks = drink_arrays(drinks, user_weight, distribution_ratio)
+    return float(bac_at(times, peaks, time.time())[0])
 
-        # Widmark formula (g/L or promille)
-        eBAC_drink = (grams_alcohol / (user_weight * distribution_ratio)) - (metabolism_rate * hours_elapsed)
+@timed("breathalyzer.bac_forecast")
+def bac_forecast(drinks, user_weight=80.0, distribution_ratio=0.68):
+    """
+    Forecast of the BAC if no more drinks are taken.
+    Returns:
+        dict with 'legal_at' and 'sober_at' (epoch seconds, when the BAC drops below
+        the legal limit and to zero) and 'times'/'values' for the chart, from an hour
+        ago (or the first drink still in the blood) until sober.
+    """
+    now = time.time()
+    times, peaks = drink_arrays(drinks, user_weight, distribution_ratio)
+    sober_at = time_below(times, peaks, 0.0, now)
+    legal_at = time_below(times, peaks, LEGAL_LIMIT, now)
 
-        if eBAC_drink < 0:
-            eBAC_drink = 0.0
+    in_blood = times[times + 3600.0 * peaks / METABOLISM_RATE > now - 3600.0]
+    start = min(now - 3600.0, in_blood.min()) if in_blood.size else now - 3600.0
+    grid, values = bac_curve(times, peaks, start, max(sober_at, now) + 900.0)
+    return {"legal_at": legal_at, "sober_at": sober_at, "times": grid, "values": values}
 
-        total_bac += eBAC_drink
+def brussels_time(timestamp):
+    """
+    Epoch seconds as a Brussels wall-clock time, like the rest of the site, not
+    the server's timezone. Naive, so the chart shows it as is.
+    """
+    import pytz
+    return datetime.fromtimestamp(timestamp, pytz.timezone("Europe/Brussels")).replace(tzinfo=None)
 
-    # Floor at 0 if negative
-    if total_bac < 0:
-        total_bac = 0.0
+def unlocked_rewards(counts):
+    """
+    Returns the rewards whose count is reached, in one pass over the drink counts.
+    """
+    return [REWARDS[(name, count)] for name, count in counts.items() if (name, count) in REWARDS]
 
-    return total_bac
+def show_reward(reward):
+    """
+    Plays a reward. Balloons, snow, toasts and GIFs all run in the browser.
+    """
+    effect = reward["effect"]
+    if effect == "toast":
+        st.toast(reward["message"])
+        return
+    if effect == "balloons":
+        st.balloons()
+    elif effect == "snow":
+        st.snow()
+    elif effect == "animation":
+        st.markdown(embed_animation(reward["animation"], width=200), unsafe_allow_html=True)
+    st.success(reward["message"])
+
+def drink_row(entry, profile_id):
+    """
+    One drink with its image and an add button; plays the rewards it unlocks.
+    Returns the updated drink summary if the drink was added, else None.
+    """
+    cols = st.columns([1, 3])  # left column for image, right column for button
+    with cols[0]:
+        if entry.get("image") and os.path.isfile(entry["image"]):
+            st.image(derived_image_path(entry["image"]), width=70)
+        elif entry.get("image"):
+            st.warning(f"Image not found: {entry['image']}")
+    with cols[1]:
+        if st.button(entry["name"], key=f"add_{entry['id']}"):
+            # Add the drink to the log, which hands back the updated counts
+            summary = add_drink(entry["id"], profile_id)
+            st.success(f"Added: {entry['name']}")
+
+            # Unlock rewards based on counts
+            for reward in unlocked_rewards(summary["counts"]):
+                show_reward(reward)
+            return summary
+    return None
 
 def main():
     # Configure the page title & layout
@@ -114,108 +243,43 @@ def main():
         Hi Co, here you can track your Blood Alcohol Content over time.  
         """
     )
-    st.write("(Yes, it is based on your weight. No, I don't know your weight).")
+    st.write("(Yes, it is based on your weight. Set it in your profile below).")
     st.write("Just select the drinks you're having.")
 
-    # Define drinks with volume, ABV fraction, and image path
-    # Adjust image paths to match your actual files in static/images
-    drinks_info = {
-        "Beer (25cl ~5%)": {
-            "name": "Beer (25cl ~5%)",
-            "volume_ml": 250,
-            "abv": 0.05,
-            "image": "static/images/beer_light.jpg"
-        },
-        "Strong Beer (33cl ~8%)": {
-            "name": "Strong Beer (33cl ~8%)",
-            "volume_ml": 330,
-            "abv": 0.08,
-            "image": "static/images/beer_strong.jpg"
-        },
-        "Wine (20cl ~12%)": {
-            "name": "Wine (20cl ~12%)",
-            "volume_ml": 200,
-            "abv": 0.12,
-            "image": "static/images/wine.jpg"
-        },
-        "Shot (4cl ~40%)": {
-            "name": "Shot (4cl ~40%)",
-            "volume_ml": 40,
-            "abv": 0.40,
-            "image": "static/images/shot.jpg"
-        },
-        "Cocktail (~25cl)": {
-            "name": "Cocktail (~25cl)",
-            "volume_ml": 250,
-            "abv": 0.20,  # approximate
-            "image": "static/images/cocktail.jpg"
-        }
-    }
+    profile_id, settings = select_profile()
+
+    catalog = get_catalog()
+    featured = catalog.featured()
+
+    # Rerun whenever another session changes this profile's log
+    subscribe(watched_log(profile_id).path)
+    views = st.session_state.setdefault("drink_views", {})
 
     # Display drink options with images
     st.subheader("Choose a drink:")
 
-    for drink_name, info in drinks_info.items():
-        # Create a row with image and button
-        cols = st.columns([1, 3])  # left column for image, right column for button
-        with cols[0]:
-            if os.path.isfile(info["image"]):
-                st.image(info["image"], width=70)
-            else:
-                st.warning(f"Image not found: {info['image']}")
-        with cols[1]:
-            if st.button(drink_name):
-                # Add the drink to the JSON file
-                add_drink(info)
-                st.success(f"Added: {drink_name}")
-
-                # Load current drinks to count
-                drinks = load_drinks()
-                beer_count = sum(1 for d in drinks if d["name"] == "Beer (25cl ~5%)")
-                strong_beer_count = sum(1 for d in drinks if d["name"] == "Strong Beer (33cl ~8%)")
-                wine_count = sum(1 for d in drinks if d["name"] == "Wine (20cl ~12%)")
-                shot_count = sum(1 for d in drinks if d["name"] == "Shot (4cl ~40%)")
-                cocktail_count = sum(1 for d in drinks if d["name"] == "Cocktail (~25cl)")
-
-                # Unlock messages based on counts
-                unlocked = False
-                if beer_count == 3:
-                    with st.spinner("Unlocking your reward..."):
-                        time.sleep(1)
-                        st.balloons()
-                        st.success("You've unlocked: car keys! 🚗🔑")
-                        unlocked = True
-                if strong_beer_count == 2:
-                    with st.spinner("Unlocking your reward..."):
-                        time.sleep(1)
-                        st.snow()
-                        st.success("You've unlocked: car keys! 🚗🔑")
-                        unlocked = True
-                if shot_count == 3:
-                    with st.spinner("Unlocking your reward..."):
-                        time.sleep(1)
-                        st.toast("You've unlocked: Flight to Mexico! 🛫🏖️")
-                        unlocked = True
-                if wine_count == 3:
-                    with st.spinner("Unlocking your reward..."):
-                        time.sleep(1)
-                        st.image("static/images/wine_glass.gif", width=200)  # Ensure this GIF exists
-                        st.success("You've unlocked: The closet! 🍷👩‍🎓")
-                        unlocked = True
-                if cocktail_count == 2:
-                    with st.spinner("Unlocking your reward..."):
-                        time.sleep(1)
-                        st.image("static/images/cocktail_party.gif", width=200)  # Ensure this GIF exists
-                        st.success("You've unlocked: The closet! 🍹👨‍🎓")
-                        unlocked = True
-
+    for entry in featured:
+        drink_row(entry, profile_id)
         st.write("---")  # Separator line for clarity
 
-    # Load drinks from the JSON file
-    drinks = load_drinks()
+    # The rest of the catalog is found through search
+    if len(catalog) > len(featured):
+        query = st.text_input("Looking for something else?", placeholder="Search drinks")
+        if query:
+            matches = [entry for entry in catalog.search(query) if not entry.get("featured")]
+            for entry in matches:
+                drink_row(entry, profile_id)
+            if not matches:
+                st.info("No drink matches your search.")
+        st.write("---")
+
+    # Counts per drink and the drinks still in the blood, read once per run (after
+    # any drink added above), reusing this session's copy while the log is unchanged
+    summary, drinks = load_drink_state(profile_id, cache=views)
 
     # Calculate BAC in promille
-    bac = calculate_bac(drinks, user_weight=80.0, distribution_ratio=0.68)
+    bac = calculate_bac(drinks, settings["weight_kg"], settings["distribution_ratio"])
+    compact_expired_drinks(drinks, profile_id)
     st.markdown(f"**Your alcohol level is:** `{bac:.5f} ‰`")
 
     # Provide feedback based on BAC (Belgian legal limit is 0.5‰)
@@ -226,27 +290,37 @@ def main():
     else:
         st.success("You have no alcohol in your blood.")
 
+    # Forecast, assuming you stop drinking now
+    if bac > 0.0:
+        forecast = bac_forecast(drinks, settings["weight_kg"], settings["distribution_ratio"])
+        if bac >= LEGAL_LIMIT:
+            st.markdown(f"**Below the limit at:** {brussels_time(forecast['legal_at']):%H:%M}")
+        st.markdown(f"**Completely sober at:** {brussels_time(forecast['sober_at']):%H:%M}")
+        st.line_chart(
+            {
+                "Time": [brussels_time(t) for t in forecast["times"]],
+                "BAC (‰)": forecast["values"],
+                "Legal limit (‰)": [LEGAL_LIMIT] * len(forecast["values"]),
+            },
+            x="Time",
+            y=["BAC (‰)", "Legal limit (‰)"],
+        )
+
     # Display counts of each drink type
     st.write("---")
     st.subheader("Your Drink Counts:")
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.markdown(f"**Beer (25cl ~5%)**: {sum(1 for d in drinks if d['name'] == 'Beer (25cl ~5%)')}")
-    with col2:
-        st.markdown(f"**Strong Beer (33cl ~8%)**: {sum(1 for d in drinks if d['name'] == 'Strong Beer (33cl ~8%)')}")
-    with col3:
-        st.markdown(f"**Wine (20cl ~12%)**: {sum(1 for d in drinks if d['name'] == 'Wine (20cl ~12%)')}")
-
-    col4, col5, col6 = st.columns(3)
-    with col4:
-        st.markdown(f"**Shot (4cl ~40%)**: {sum(1 for d in drinks if d['name'] == 'Shot (4cl ~40%)')}")
-    with col5:
-        st.markdown(f"**Cocktail (~25cl)**: {sum(1 for d in drinks if d['name'] == 'Cocktail (~25cl)')}")
+    counts = summary["counts"]
+    shown = featured + [catalog.get(drink_id) or {"id": drink_id, "name": drink_id}
+                        for drink_id in counts if not (catalog.get(drink_id) or {}).get("featured")]
+    for start in range(0, len(shown), 3):
+        for col, entry in zip(st.columns(3), shown[start:start + 3]):
+            with col:
+                st.markdown(f"**{entry['name']}**: {counts.get(entry['id'], 0)}")
 
     # Option to reset drink log
     st.write("---")
     if st.button("Reset Drink Log"):
-        reset_drinks()
+        reset_drinks(profile_id)
         st.success("Drink log has been reset.")
 
 if __name__ == "__main__":
@@ -6,14 +6,14 @@ import json
 import os
 import time
 from datetime import datetime
-import pytz  # Ensure pytz is installed
 import re
 
+from helpers.metrics import timed
+
 # Constants
 CACHE_FILE = "static/data/standard_liege_cache.json"
 CACHE_DURATION_SECONDS = 86400  # 24 hours
 API_HOST = "free-api-live-football-data.p.rapidapi.com"
-API_KEY = st.secrets["rapidapi_key"]
 STANDARD_TEAM_ID = 9985
 BELGIAN_PRO_LEAGUE_ID = 40  # Typically the correct league ID for the Belgian Pro League
 STANDARD_TEAM_NAME = "Standard Liege"
@@ -226,11 +226,24 @@ def main():
     st.markdown("[Standard de Liège Official Site](https://standard.be/)")
     st.markdown("[Standard de Liège on FotMob](https://www.fotmob.com/teams/9985/overview/standard-liege)")
     
+def get_api_key():
+    """
+    Returns the RapidAPI key from st.secrets, or None if it is not configured.
+    Resolved when data is actually fetched rather than at import, so a missing
+    secret no longer crashes the page before anything renders.
+    """
+    try:
+        return st.secrets["rapidapi_key"]
+    except (KeyError, FileNotFoundError):
+        return None
+
+@timed("liegois.get_standard_cache")
 def get_standard_cache():
     """
     Reads the local JSON cache for Standard data if it exists and is fresh (less than 24h old).
     Otherwise, fetches new data from the free-api-live-football-data and writes it to cache.
     """
+    cached_data = {}
     if os.path.isfile(CACHE_FILE):
         with open(CACHE_FILE, "r", encoding="utf-8") as f:
             try:
@@ -242,18 +255,30 @@ def get_standard_cache():
             if (time.time() - last_updated) < CACHE_DURATION_SECONDS:
                 return cached_data  # still valid
 
+    api_key = get_api_key()
+    if api_key is None:
+        st.warning("No API key configured (rapidapi_key secret). Showing the last known data.")
+        if "timestamp" in cached_data:
+            return cached_data  # stale, but better than nothing
+        return {
+            "timestamp": time.time(),
+            "team_detail_raw": DEFAULT_TEAM_DETAIL_JSON,
+            "league_matches_raw": DEFAULT_LEAGUE_MATCHES_JSON,
+            "league_news_raw": json.dumps([]),
+        }
+
     st.info("Fetching fresh data for Standard de Liège...")
     
     # Team detail
-    team_detail_raw = fetch_team_detail(STANDARD_TEAM_ID)
+    team_detail_raw = fetch_team_detail(STANDARD_TEAM_ID, api_key)
     team_detail_parsed = parse_api_response(team_detail_raw, 'team_detail')
     
     # League matches
-    league_matches_raw = fetch_league_matches(BELGIAN_PRO_LEAGUE_ID)
+    league_matches_raw = fetch_league_matches(BELGIAN_PRO_LEAGUE_ID, api_key)
     league_matches_parsed = parse_api_response(league_matches_raw, 'league_matches')
     
     # League news (pages 1,4,7)
-    league_news_raw = fetch_league_news(BELGIAN_PRO_LEAGUE_ID, pages=[1])
+    league_news_raw = fetch_league_news(BELGIAN_PRO_LEAGUE_ID, api_key, pages=[1])
     league_news_parsed = parse_api_response(league_news_raw, 'league_news')
     
     # Fallback to defaults if needed
@@ -293,10 +318,18 @@ def get_standard_cache():
     
     return new_data
 
-def fetch_team_detail(team_id):
+def gmt_to_brussels(gmt_time):
+    """
+    Converts a naive GMT datetime to Brussels time.
+    pytz is imported on first use, like in pages/Sjoe.py, as it is most of this page's import time.
+    """
+    import pytz
+    return pytz.timezone("GMT").localize(gmt_time).astimezone(pytz.timezone("Europe/Brussels"))
+
+def fetch_team_detail(team_id, api_key):
     conn = http.client.HTTPSConnection(API_HOST)
     headers = {
-        'x-rapidapi-key': API_KEY,
+        'x-rapidapi-key': api_key,
         'x-rapidapi-host': API_HOST
     }
     endpoint = f"/football-league-team?teamid={team_id}"
@@ -304,10 +337,10 @@ def fetch_team_detail(team_id):
     res = conn.getresponse()
     return res.read().decode("utf-8")
 
-def fetch_league_matches(league_id):
+def fetch_league_matches(league_id, api_key):
     conn = http.client.HTTPSConnection(API_HOST)
     headers = {
-        'x-rapidapi-key': API_KEY,
+        'x-rapidapi-key': api_key,
         'x-rapidapi-host': API_HOST
     }
     endpoint = f"/football-get-all-matches-by-league?leagueid={league_id}"
@@ -315,13 +348,13 @@ def fetch_league_matches(league_id):
     res = conn.getresponse()
     return res.read().decode("utf-8")
 
-def fetch_league_news(league_id, pages=[1, 4, 7]):
+def fetch_league_news(league_id, api_key, pages=[1, 4, 7]):
     """
     Aggregates news from the specified pages, removing duplicates will be handled later.
     """
     conn = http.client.HTTPSConnection(API_HOST)
     headers = {
-        'x-rapidapi-key': API_KEY,
+        'x-rapidapi-key': api_key,
         'x-rapidapi-host': API_HOST
     }
     
@@ -383,11 +416,7 @@ def display_next_match_info(cached_data):
                 datetime_str = f"{date_str} {time_str}"
                 try:
                     gmt_time = datetime.strptime(datetime_str, "%a, %d %b %Y %H:%M")
-                    gmt_timezone = pytz.timezone("GMT")
-                    gmt_time = gmt_timezone.localize(gmt_time)
-                    
-                    belgium_timezone = pytz.timezone("Europe/Brussels")
-                    belgium_time = gmt_time.astimezone(belgium_timezone)
+                    belgium_time = gmt_to_brussels(gmt_time)
                     
                     formatted_time = belgium_time.strftime("%A, %d %B %Y at %H:%M CET")
                 except ValueError:
@@ -449,11 +478,7 @@ def display_upcoming_fixtures(cached_data):
             away_team = fixture.get("awayTeamName", "???")
             try:
                 gmt_time = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S.%fZ")
-                gmt_timezone = pytz.timezone("GMT")
-                gmt_time = gmt_timezone.localize(gmt_time)
-
-                belgium_timezone = pytz.timezone("Europe/Brussels")
-                belgium_time = gmt_time.astimezone(belgium_timezone)
+                belgium_time = gmt_to_brussels(gmt_time)
 
                 formatted_time = belgium_time.strftime("%A, %d %B %Y at %H:%M CET")
             except ValueError:
@@ -1,38 +1,96 @@
 # pages/1_Anouk.py
 
 import streamlit as st
-from datetime import datetime, timedelta
-import pytz
-import folium
-from streamlit_folium import st_folium
+from datetime import datetime
 import os
 import json
+import threading
+import time
+
+from helpers.live_clock import live_elapsed
+from helpers.maps import map_iframe_tag, map_image_tag
+from helpers.metrics import span
+from helpers.state_watch import mark_changed, subscribe, watch_file, watched_value
+from helpers.text_history import get_text_history
 
 # Define the path for the cache file
 CACHE_DIR = "static/data"
 CACHE_FILE = os.path.join(CACHE_DIR, "sjoe_cache.json")
 
+# Ring buffer of the last texts, behind the trends (see helpers/text_history.py)
+HISTORY_FILE = os.path.join(CACHE_DIR, "sjoe_history.bin")
+HISTORY_CAPACITY = 1000
+
+# Anouk's location in Limburg (Hasselt)
+MAP_CENTER = (50.9352, 5.3249)
+MAP_ZOOM = 12
+MAP_MARKERS = ((50.9352, 5.3249, "Anouk is here!", "Anouk's Location in Limburg"),)
+MAP_WIDTH = 700
+MAP_HEIGHT = 500
+
+# "interactive" (Leaflet) or "static" (a PNG); clients can override it with ?map=static
+MAP_MODE = os.environ.get("SJOE_MAP_MODE", "interactive")
+
+# How often the counter fragment re-reads the last text time, in seconds
+COUNTER_REFRESH_SECONDS = 10
+
+# Timed messages based on the time since the last text, in seconds
+TEXT_BANDS = [
+    {"name": "safe", "from": 0, "to": 30, "kind": "info",
+     "text": "You're safe for now. {remaining} seconds until the next message"},
+    {"name": "danger", "from": 120, "to": 900, "kind": "warning",
+     "text": "❗ You're in the danger zone"},
+    {"name": "flowers", "from": 900, "to": 3600, "kind": "warning",
+     "text": "🌹 \"You better buy me flowers\" ~Anouk"},
+    {"name": "done", "from": 3600, "to": None, "kind": "error",
+     "text": "💔 \"We're so done\""},
+]
+
+# Texting again before the danger zone keeps a streak going
+STREAK_GAP = next(band["from"] for band in TEXT_BANDS if band["name"] == "danger")
+
+def brussels_now():
+    """
+    Returns the current time in Brussels.
+    pytz is imported on first use, like folium in helpers/maps.py, to keep the page's first render fast.
+    """
+    import pytz
+    return datetime.now(pytz.timezone('Europe/Brussels'))
+
+def parse_cache(path):
+    """
+    Parses the cache file for the file-watch service (see helpers/state_watch.py).
+    Returns the cache with 'last_text_time' as a datetime, or None if the file
+    is missing or corrupted.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        # Parse the datetime string back to a datetime object
+        cache['last_text_time'] = datetime.fromisoformat(cache['last_text_time'])
+        return cache
+    except (OSError, json.JSONDecodeError, KeyError, ValueError, TypeError):
+        return None
+
 def get_cache():
     """
-    Reads the cache file and returns the cached data.
+    Returns the cached data, from the in-memory copy kept up to date by the
+    file-watch service: the file is parsed once per change (validated by its
+    mtime, size and inode), so no disk access is needed while it is unchanged.
     If the cache doesn't exist or is corrupted, initialize with default values.
     """
-    if not os.path.exists(CACHE_DIR):
-        os.makedirs(CACHE_DIR)
+    watch_file(CACHE_FILE, parse_cache)
+    _, cache = watched_value(CACHE_FILE)
+    if cache is not None:
+        return dict(cache)
 
     if os.path.isfile(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, "r", encoding="utf-8") as f:
-                cache = json.load(f)
-                if 'last_text_time' in cache:
-                    # Parse the datetime string back to a datetime object
-                    cache['last_text_time'] = datetime.fromisoformat(cache['last_text_time'])
-                    return cache
-        except (json.JSONDecodeError, KeyError, ValueError):
-            st.warning("Cache file is corrupted. Resetting cache.")
+        st.warning("Cache file is corrupted. Resetting cache.")
+    if not os.path.exists(CACHE_DIR):
+        os.makedirs(CACHE_DIR)
 
     # Initialize default cache (set to current time)
-    default_time = datetime.now(pytz.timezone('Europe/Brussels'))
+    default_time = brussels_now()
     default_cache = {
         "last_text_time": default_time.isoformat()
     }
@@ -43,7 +101,8 @@ def get_cache():
 
 def save_cache(cache):
     """
-    Saves the cache data to the cache file.
+    Atomically saves the cache data to the cache file (temp file + rename), so
+    a concurrent reader sees either the old or the new file, never a truncated one.
     The 'last_text_time' is stored as an ISO-formatted string.
     """
     cache_to_save = cache.copy()
@@ -56,113 +115,125 @@ def save_cache(cache):
             cache_to_save['last_text_time'] = dt.isoformat()
         except ValueError:
             # If parsing fails, set to current time
-            cache_to_save['last_text_time'] = datetime.now(pytz.timezone('Europe/Brussels')).isoformat()
+            cache_to_save['last_text_time'] = brussels_now().isoformat()
     else:
         # Set to current time if not datetime or string
-        cache_to_save['last_text_time'] = datetime.now(pytz.timezone('Europe/Brussels')).isoformat()
-
-    with open(CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(cache_to_save, f, ensure_ascii=False, indent=2)
-
-def time_since_last_text(last_text_time):
+        cache_to_save['last_text_time'] = brussels_now().isoformat()
+
+    # One temp file per writer, so two sessions saving at once don't write into the same one
+    tmp_path = f"{CACHE_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache_to_save, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, CACHE_FILE)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    mark_changed(CACHE_FILE)
+
+def text_history():
+    return get_text_history(HISTORY_FILE, HISTORY_CAPACITY, bands=TEXT_BANDS, streak_gap=STREAK_GAP)
+
+def format_duration(seconds):
     """
-    Calculate the time elapsed since the last text.
-    Returns a timedelta object.
+    Formats a duration as e.g. "2h 05m", "3m 20s" or "45s".
     """
-    now = datetime.now(pytz.timezone('Europe/Brussels'))
-    delta = now - last_text_time
-    return delta
-
-def create_map(latitude, longitude):
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    if minutes:
+        return f"{minutes}m {seconds:02d}s"
+    return f"{seconds}s"
+
+def show_trends():
     """
-    Create a Folium map centered at the given latitude and longitude.
-    Adds a marker indicating Anouk's location.
+    Shows the statistics of the text history. They are kept up to date per
+    text, so the cost is bounded by the size of the history's ring.
     """
-    my_map = folium.Map(location=[latitude, longitude], zoom_start=12)
-    folium.Marker(
-        [latitude, longitude],
-        tooltip="Anouk is here!",
-        popup="Anouk's Location in Limburg"
-    ).add_to(my_map)
-    return my_map
-
-def main():
-    # Configure the page title & layout
-    st.set_page_config(
-        page_title="Sjoe",
-        page_icon=":heart:",
-        layout="wide"
-    )
-
-    st.title("Sjoe :heart:")
-    st.write("## Should I text Anouk?")
-
-    # Initialize session state for auto-refresh control
-    if 'last_rerun' not in st.session_state:
-        st.session_state['last_rerun'] = datetime.now(pytz.timezone('Europe/Brussels'))
-
-    # Load cache
+    stats = text_history().stats(now=time.time())
+    if stats["mean_gap"] is None:
+        st.caption("Trends show up from the second text on.")
+        return
+
+    with st.expander(f"Trends over the last {stats['in_window']} texts"):
+        cols = st.columns(4)
+        cols[0].metric("Mean gap", format_duration(stats["mean_gap"]))
+        cols[1].metric("Median gap", format_duration(stats["median_gap"]))
+        cols[2].metric("Current streak", stats["current_streak"])
+        cols[3].metric("Longest streak", stats["longest_streak"])
+        st.caption(
+            "Time spent per zone: "
+            + " · ".join(f"{name} {format_duration(seconds)}" for name, seconds in stats["band_seconds"].items())
+        )
+
+def show_map():
+    """
+    Shows the map of the requested mode. Both renders are cached per process
+    (see helpers/maps.py), so a rerun only sends a tag with a URL (or the cached markup).
+    """
+    mode = st.query_params.get("map", MAP_MODE)
+    if mode == "static":
+        with span("sjoe.map_image"):
+            tag = map_image_tag(MAP_CENTER, MAP_ZOOM, MAP_MARKERS, MAP_WIDTH, MAP_HEIGHT)
+        if tag is not None:
+            st.markdown(tag, unsafe_allow_html=True)
+            return
+
+    with span("sjoe.map_html"):
+        tag = map_iframe_tag(MAP_CENTER, MAP_ZOOM, MAP_MARKERS, MAP_WIDTH, MAP_HEIGHT)
+    st.markdown(tag, unsafe_allow_html=True)
+
+@st.fragment(run_every=COUNTER_REFRESH_SECONDS)
+def text_counter():
+    """
+    The "texted" button, the counter and the timed messages. This is a fragment
+    with its own timed refresh, so neither a click nor a refresh re-executes the
+    rest of the page (the map).
+    """
+    # Load cache, and rerun as soon as someone else texts Sjoe
     cache = get_cache()
+    subscribe(CACHE_FILE)
     last_text_time = cache['last_text_time']
 
     # Button to reset the counter
     if st.button("I've texted Sjoe"):
-        new_time = datetime.now(pytz.timezone('Europe/Brussels'))
+        new_time = brussels_now()
         st.session_state['last_text_time'] = new_time
         cache['last_text_time'] = new_time
         save_cache(cache)
+        text_history().append(new_time.timestamp())
+        last_text_time = new_time
         st.success("You've successfully texted Anouk!")
-        st.rerun()
 
-    # Calculate time since last text
-    delta = time_since_last_text(last_text_time)
+    # Display the counter and the timed messages. Both tick in the browser,
+    # so the fragment only needs to rerun to pick up texts from other sessions.
+    live_elapsed(
+        last_text_time,
+        template="<b>You've not texted Sjoe for:</b> {value}",
+        bands=TEXT_BANDS,
+    )
+    show_trends()
 
-    # Display the counter
-    days = delta.days
-    hours, remainder = divmod(delta.seconds, 3600)
-    minutes, seconds = divmod(remainder, 60)
+def main():
+    # Configure the page title & layout
+    st.set_page_config(
+        page_title="Sjoe",
+        page_icon=":heart:",
+        layout="wide"
+    )
 
-    if days > 0:
-        time_str = f"{days} days, {hours} hours, {minutes} minutes, {seconds} seconds"
-    else:
-        time_str = f"{hours} hours, {minutes} minutes, {seconds} seconds"
-
-    st.write(f"**You've not texted Sjoe for:** {time_str}")
-
-    # Display timed messages based on elapsed time with emojis
-    if delta >= timedelta(minutes=60):
-        st.error(":broken_heart: \"We're so done\"")
-    elif delta >= timedelta(minutes=15):
-        st.warning(":rose: \"You better buy me flowers\" ~Anouk")
-    elif delta >= timedelta(minutes=2):
-        st.warning(":exclamation: You're in the danger zone")
-
-    # Optional: Display countdown until the next message
-    if delta < timedelta(seconds=30):
-        remaining = timedelta(seconds=30) - delta
-        st.info(f"You're safe for now. {remaining.seconds} seconds until the next message")
-    elif timedelta(seconds=30) <= delta < timedelta(minutes=2):
-        remaining = timedelta(minutes=2) - delta
-        #st.info(f"**Time until flower warning:** {remaining.seconds} seconds")
-    elif timedelta(minutes=2) <= delta < timedelta(minutes=10):
-        remaining = timedelta(minutes=10) - delta
-        #st.info(f"**Time until relationship ends:** {remaining.seconds} seconds")
+    st.title("Sjoe :heart:")
+    st.write("## Should I text Anouk?")
+
+    text_counter()
 
     st.write("---")
     st.write("## Where is she now?")
 
-    # Coordinates for Limburg, Belgium (e.g., Hasselt)
-    lat = 50.9352
-    lon = 5.3249
-
-    # Create and display the map
-    my_map = create_map(lat, lon)
-    st_folium(my_map, width=700, height=500)
-
-    # Auto-refresh every 10 seconds
-    if datetime.now(pytz.timezone('Europe/Brussels')) - st.session_state['last_rerun'] > timedelta(seconds=10):
-        st.session_state['last_rerun'] = datetime.now(pytz.timezone('Europe/Brussels'))
-        st.rerun()
+    show_map()
 
 if __name__ == "__main__":
     main()
@@ -1,80 +1,34 @@
 # pages/4_stockfish.py
 
 import streamlit as st
-import os
-import base64
 
-##################
-# Helper Functions
-##################
+from helpers.images import DERIVED_MANIFEST_FILE
+from helpers.layout import BLACK_PAGE_CSS, tile_grid_html
+from helpers.snapshot import cached_snapshot
 
-def embed_local_image(image_path: str, width=300, height=250, border_color="red"):
-    """
-    Reads an image file from disk, encodes it to base64, 
-    and returns an HTML img tag string for embedding.
-    Automatically detects MIME type based on file extension.
-    """
-    if not os.path.isfile(image_path):
-        return f"<p style='color: white;'>Image not found: {image_path}</p>"
+# 2x2 grid of images, each linking to its respective URL
+TILES = [
+    # 1) Local Weather Ixelles
+    ("static/images/weather.webp", "https://www.buienradar.be/weer/etterbeek/be/2798578"),
+    # 2) Chess Site
+    ("static/images/chess.jpg", "https://lichess.org/"),
+    # 3) Palantir Stock
+    ("static/images/palantir.png", "https://www.google.com/search?q=palantir+stock"),
+    # 4) Fishing Forecast
+    ("static/images/fish.jpeg", "https://www.accuweather.com/en/be/brussels/27581/fishing-weather/27581"),
+]
 
-    with open(image_path, "rb") as file:
-        data = file.read()
-    base64_data = base64.b64encode(data).decode("utf-8")
-    
-    # Determine the image's MIME type based on its extension
-    ext = os.path.splitext(image_path)[1].lower()
-    if ext == '.png':
-        mime = 'image/png'
-    elif ext in ['.jpg', '.jpeg']:
-        mime = 'image/jpeg'
-    elif ext == '.gif':
-        mime = 'image/gif'
-    else:
-        mime = 'image/png'  # default to PNG if unknown
-    
-    # Return the image tag without additional text
-    html_img = f"""
-    <img src="data:{mime};base64,{base64_data}"
-         style="cursor: pointer; border: 3px solid {border_color}; 
-                width: {width}px; height: {height}px;" />
+def render_static_html():
     """
-    return html_img
-
-def main():
-    # Configure the page title & layout
-    st.set_page_config(
-        page_title="The Only 4 Sites You Need",
-        page_icon=":fish:",
-        layout="wide"
-    )
-
-    ##############
-    # Page Styling
-    ##############
-    st.markdown("""
+    Builds the whole page. Nothing on it changes between runs, so it is
+    rendered once per page/image version and replayed from the snapshot.
+    """
+    return f"""
         <style>
-        /* Hide hamburger menu & footer */
-        #MainMenu {visibility: hidden;}
-        footer {visibility: hidden;}
-
-        /* Hide the entire sidebar */
-        [data-testid="stSidebar"] {
-            display: none !important;
-        }
-
-        /* Make the background black */
-        .stApp {
-            background-color: black !important;
-        }
-
-        /* Remove default padding/margins */
-        .block-container {
-            padding-top: 2rem;
-            padding-bottom: 2rem;
-        }
+        {BLACK_PAGE_CSS}
 
         /* Style for the "Back to Main Page" button */
-        .back-button {
+        .back-button {{
             background-color: red;
             color: white;
             padding: 10px 20px;
@@ -85,109 +39,38 @@ def main():
             margin-top: 30px;
             border-radius: 5px;
             cursor: pointer;
-        }
+        }}
 
-        .back-button:hover {
+        .back-button:hover {{
             background-color: darkred;
-        }
+        }}
         </style>
-    """, unsafe_allow_html=True)
 
-    ################
-    # Page Content
-    ################
-    # Title
-    st.markdown(
-        "<h1 style='color: white; text-align: center;'>4 Sites 4 You</h1>",
-        unsafe_allow_html=True
-    )
+        <h1 style='color: white; text-align: center;'>4 Sites 4 You</h1>
 
-    # Description (Optional)
-    #st.write("## :fish: Explore These Essential Sites")
+        {tile_grid_html(TILES, new_tab=True)}
 
-    # Create a 2x2 grid of images, each linking to its respective URL
-    row1col1, row1col2 = st.columns(2)
-    row2col1, row2col2 = st.columns(2)
+        <hr />
 
-    #########################
-    # 1) Local Weather Ixelles
-    #########################
-    with row1col1:
-        weather_img_html = embed_local_image("static/images/weather.webp")
-        st.markdown(
-            f"""
-            <div style='text-align: right;'>
-                <a href="https://www.buienradar.be/weer/etterbeek/be/2798578" target="_blank"
-                   style='text-decoration: none;'>{weather_img_html}</a>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-        #st.markdown("<p style='color: white; text-align: center;'>Local Weather Ixelles</p>", unsafe_allow_html=True)
-
-    ################
-    # 2) Chess Site
-    ################
-    with row1col2:
-        chess_img_html = embed_local_image("static/images/chess.jpg")
-        st.markdown(
-            f"""
-            <div style='text-align: left;'>
-                <a href="https://lichess.org/" target="_blank"
-                   style='text-decoration: none;'>{chess_img_html}</a>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-        #st.markdown("<p style='color: white; text-align: center;'>Lichess</p>", unsafe_allow_html=True)
-
-    ################
-    # 3) Palantir Stock
-    ################
-    with row2col1:
-        palantir_img_html = embed_local_image("static/images/palantir.png")
-        st.markdown(
-            f"""
-            <div style='text-align: right;'>
-                <a href="https://www.google.com/search?q=palantir+stock" target="_blank"
-                   style='text-decoration: none;'>{palantir_img_html}</a>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-        #st.markdown("<p style='color: white; text-align: center;'>Palantir Stock</p>", unsafe_allow_html=True)
-
-    ###################
-    # 4) Fishing Forecast
-    ###################
-    with row2col2:
-        fishing_img_html = embed_local_image("static/images/fish.jpeg")
-        st.markdown(
-            f"""
-            <div style='text-align: left;'>
-                <a href="https://www.accuweather.com/en/be/brussels/27581/fishing-weather/27581" target="_blank"
-                   style='text-decoration: none;'>{fishing_img_html}</a>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-        #st.markdown("<p style='color: white; text-align: center;'>Fishing Forecast</p>", unsafe_allow_html=True)
-
-    #############################
-    # "Back to Main Page" Button
-    #############################
-    # Add a horizontal rule for separation
-    st.write("---")
-
-    # Center the button using HTML/CSS
-    st.markdown(
-        """
         <div style='text-align: center;'>
             <a href="/" class="back-button">Back to Main Page</a>
         </div>
-        """,
-        unsafe_allow_html=True
+    """
+
+def main():
+    # Configure the page title & layout
+    st.set_page_config(
+        page_title="The Only 4 Sites You Need",
+        page_icon=":fish:",
+        layout="wide"
+    )
+
+    static_html = cached_snapshot(
+        "stockfish",
+        render_static_html,
+        [__file__, DERIVED_MANIFEST_FILE] + [image_path for image_path, _ in TILES],
     )
+    st.markdown(static_html, unsafe_allow_html=True)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,250 @@
+# scripts/build_images.py
+#
+# Build-time image derivative pipeline.
+# Run from the repository root whenever an image in static/images changes:
+#
+#     python scripts/build_images.py
+#
+# For every still image it writes right-sized, recompressed variants
+# (1x and 2x of the size the pages display it at) in AVIF, WebP and a
+# JPEG/PNG fallback to static/derived/, and records them in
+# static/derived/manifest.json, which helpers/images.py reads at runtime.
+# Animated GIFs are transcoded to animated WebP plus a still poster frame.
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+
+from PIL import Image, ImageFilter, ImageSequence, features
+
+SOURCE_DIR = "static/images"
+OUTPUT_DIR = "static/derived"
+MANIFEST_FILE = os.path.join(OUTPUT_DIR, "manifest.json")
+
+# Display size of each image as rendered by the pages: (width, height).
+# A height of None keeps the aspect ratio (st.image(..., width=...)).
+TILE_SIZE = (300, 250)
+DRINK_SIZE = (70, None)
+DISPLAY_SIZES = {
+    # Start.py
+    "anouk.jpg": TILE_SIZE,
+    "standard.png": TILE_SIZE,
+    "beer.jpg": TILE_SIZE,
+    "stockfish.jpeg": TILE_SIZE,
+    # pages/Stockfish.py
+    "weather.webp": TILE_SIZE,
+    "chess.jpg": TILE_SIZE,
+    "palantir.png": TILE_SIZE,
+    "fish.jpeg": TILE_SIZE,
+    # pages/Breathalyzer.py
+    "beer_light.jpg": DRINK_SIZE,
+    "beer_strong.jpg": DRINK_SIZE,
+    "wine.jpg": DRINK_SIZE,
+    "shot.jpg": DRINK_SIZE,
+    "cocktail.jpg": DRINK_SIZE,
+}
+SCALES = (1, 2)
+
+# Width of the low-quality placeholder inlined in the manifest
+PLACEHOLDER_WIDTH = 16
+
+# Animated rewards, shown at this width by pages/Breathalyzer.py
+ANIMATION_WIDTHS = {
+    "wine_glass.gif": 200,
+    "cocktail_party.gif": 200,
+}
+
+FORMATS = {
+    "avif": {"mime": "image/avif", "ext": ".avif", "params": {"quality": 55}},
+    "webp": {"mime": "image/webp", "ext": ".webp", "params": {"quality": 80, "method": 6}},
+    "jpeg": {"mime": "image/jpeg", "ext": ".jpg", "params": {"quality": 82, "optimize": True, "progressive": True}},
+    "png": {"mime": "image/png", "ext": ".png", "params": {"optimize": True}},
+}
+
+def source_digest(path):
+    """
+    Returns the SHA-256 hex digest of a source image, used to detect stale derivatives.
+    """
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def target_size(image, display_size, scale):
+    """
+    Pixel size of a variant. Mirrors how the page sizes the image:
+    tiles are stretched to a fixed box by CSS, drink images keep their aspect ratio.
+    Never upscales: a source smaller than the 1x box is only recompressed,
+    and higher densities are skipped.
+    """
+    width, height = display_size
+    if height is None:
+        height = round(image.height * width / image.width)
+    width, height = width * scale, height * scale
+    if width > image.width or height > image.height:
+        return image.size if scale == 1 else None
+    return width, height
+
+def fallback_format(image):
+    """
+    Formats every browser understands: PNG for images with transparency, JPEG otherwise.
+    """
+    has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+    return "png" if has_alpha else "jpeg"
+
+def placeholder(image):
+    """
+    Returns a tiny blurred WebP thumbnail as a data URI and the average colour
+    as a hex string, shown while the full image loads.
+    """
+    height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+    thumb = image.convert("RGB").resize((PLACEHOLDER_WIDTH, height), Image.BOX)
+    thumb = thumb.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    thumb.save(buffer, format="WEBP", quality=30)
+    data_uri = "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+    r, g, b = thumb.resize((1, 1), Image.BOX).getpixel((0, 0))
+    return data_uri, f"#{r:02x}{g:02x}{b:02x}"
+
+def save_variant(image, fmt, out_path):
+    spec = FORMATS[fmt]
+    if fmt == "jpeg" and image.mode != "RGB":
+        image = image.convert("RGB")
+    image.save(out_path, format=fmt.upper(), **spec["params"])
+    return os.path.getsize(out_path)
+
+def build_image(name, display_size, formats):
+    """
+    Writes the variants of one source image and returns its manifest entry.
+    Modern-format variants that are not smaller than the fallback are dropped.
+    """
+    source_path = os.path.join(SOURCE_DIR, name)
+    stem = os.path.splitext(name)[0]
+    with Image.open(source_path) as source:
+        source.load()
+        fallback = fallback_format(source)
+        image = source.convert("RGBA" if fallback == "png" else "RGB")
+
+    variants = []
+    for scale in SCALES:
+        size = target_size(image, display_size, scale)
+        if size is None:
+            continue
+        resized = image.resize(size, Image.LANCZOS)
+
+        scale_variants = []
+        for fmt in formats + [fallback]:
+            out_path = os.path.join(OUTPUT_DIR, f"{stem}.{size[0]}x{size[1]}{FORMATS[fmt]['ext']}")
+            scale_variants.append({
+                "path": out_path.replace(os.sep, "/"),
+                "format": fmt,
+                "mime": FORMATS[fmt]["mime"],
+                "scale": scale,
+                "width": size[0],
+                "height": size[1],
+                "bytes": save_variant(resized, fmt, out_path),
+            })
+
+        fallback_bytes = scale_variants[-1]["bytes"]
+        for variant in scale_variants[:-1]:
+            if variant["bytes"] >= fallback_bytes:
+                os.remove(variant["path"])
+        variants.extend(v for v in scale_variants if v["format"] == fallback or v["bytes"] < fallback_bytes)
+
+    # A placeholder would stay visible through transparent pixels, so PNGs go without
+    placeholder_uri, color = placeholder(image) if fallback == "jpeg" else (None, None)
+    return {
+        "source_digest": source_digest(source_path),
+        "source_bytes": os.path.getsize(source_path),
+        "display_width": display_size[0],
+        "display_height": display_size[1],
+        "fallback": fallback,
+        "placeholder": placeholder_uri,
+        "color": color,
+        "variants": variants,
+    }
+
+def build_animation(name, width):
+    """
+    Transcodes an animated GIF to animated WebP at 1x and 2x of its display width,
+    keeping frame timings and looping, and writes the first frame as a poster.
+    """
+    source_path = os.path.join(SOURCE_DIR, name)
+    stem = os.path.splitext(name)[0]
+    with Image.open(source_path) as source:
+        frames = [frame.convert("RGBA") for frame in ImageSequence.Iterator(source)]
+        durations = [frame.info.get("duration", 100) for frame in ImageSequence.Iterator(source)]
+        loop = source.info.get("loop", 0)
+
+    variants = []
+    poster_path = None
+    for scale in SCALES:
+        size = target_size(frames[0], (width, None), scale)
+        if size is None:
+            continue
+        resized = [frame.resize(size, Image.LANCZOS) for frame in frames]
+        out_path = os.path.join(OUTPUT_DIR, f"{stem}.{size[0]}x{size[1]}.webp")
+        resized[0].save(
+            out_path,
+            format="WEBP",
+            save_all=True,
+            append_images=resized[1:],
+            duration=durations,
+            loop=loop,
+            quality=75,
+            method=6,
+        )
+        variants.append({
+            "path": out_path.replace(os.sep, "/"),
+            "format": "webp",
+            "mime": "image/webp",
+            "scale": scale,
+            "width": size[0],
+            "height": size[1],
+            "bytes": os.path.getsize(out_path),
+        })
+        if scale == 1:
+            poster_path = os.path.join(OUTPUT_DIR, f"{stem}.{size[0]}x{size[1]}.poster.webp")
+            resized[0].save(poster_path, format="WEBP", quality=60)
+
+    return {
+        "source_digest": source_digest(source_path),
+        "source_bytes": os.path.getsize(source_path),
+        "display_width": width,
+        "display_height": None,
+        "fallback": "gif",
+        "animated": True,
+        "poster": poster_path.replace(os.sep, "/"),
+        "variants": variants,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Build right-sized image variants for the pages.")
+    parser.add_argument("--no-avif", action="store_true", help="Skip AVIF output")
+    args = parser.parse_args()
+
+    formats = ["webp"]
+    if not args.no_avif and features.check("avif"):
+        formats.insert(0, "avif")
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    manifest = {"version": 1, "images": {}}
+    for name, display_size in sorted(DISPLAY_SIZES.items()):
+        entry = build_image(name, display_size, formats)
+        manifest["images"][f"{SOURCE_DIR}/{name}"] = entry
+        smallest = min(v["bytes"] for v in entry["variants"])
+        print(f"{name}: {entry['source_bytes']} -> {smallest} bytes ({len(entry['variants'])} variants)")
+
+    for name, width in sorted(ANIMATION_WIDTHS.items()):
+        entry = build_animation(name, width)
+        manifest["images"][f"{SOURCE_DIR}/{name}"] = entry
+        sizes = ", ".join(f"{v['width']}w {v['bytes']}" for v in entry["variants"])
+        print(f"{name}: {entry['source_bytes']} -> {sizes} bytes (animated)")
+
+    with open(MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# scripts/seed_tiles.py
+#
+# Pre-seeds the local MBTiles tile store (see helpers/tiles.py) with the map
+# tiles around Limburg, so the Sjoe map works without network.
+# Run from the repository root:
+#
+#     python scripts/seed_tiles.py
+#     python scripts/seed_tiles.py --zooms 8 16 --bbox 50.68 4.98 51.38 5.92
+#
+# Tiles already in the store are skipped, so an interrupted run can be resumed.
+# The store is then exported to static/tiles/{z}/{x}/{y}.png, where the
+# interactive map loads it from through Streamlit static serving
+# (--export-only re-exports without seeding).
+# The OSM tile usage policy forbids heavy bulk downloads: keep the box and the
+# zoom range small, and keep the delay between requests.
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.tiles import (
+    LIMBURG_BBOX,
+    LIMBURG_ZOOMS,
+    STATIC_TILES_DIR,
+    TILES_FILE,
+    bbox_tiles,
+    export_static_tiles,
+    fetch_upstream,
+    open_store,
+    read_tile,
+    write_tile,
+)
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-seed the local map tile store.")
+    parser.add_argument("--bbox", nargs=4, type=float, default=list(LIMBURG_BBOX),
+                        metavar=("SOUTH", "WEST", "NORTH", "EAST"))
+    parser.add_argument("--zooms", nargs=2, type=int, default=[LIMBURG_ZOOMS.start, LIMBURG_ZOOMS.stop - 1],
+                        metavar=("MIN", "MAX"), help="Zoom levels to seed, inclusive")
+    parser.add_argument("--delay", type=float, default=0.1, help="Seconds between upstream requests")
+    parser.add_argument("--output", default=TILES_FILE)
+    parser.add_argument("--static-dir", default=STATIC_TILES_DIR, help="Where to export the tiles for static serving")
+    parser.add_argument("--export-only", action="store_true", help="Only export the store, don't seed it")
+    args = parser.parse_args()
+
+    connection = open_store(args.output)
+    zooms = [] if args.export_only else range(args.zooms[0], args.zooms[1] + 1)
+    for zoom in zooms:
+        tiles = list(bbox_tiles(args.bbox, zoom))
+        fetched = failed = 0
+        for x, y in tiles:
+            if read_tile(connection, zoom, x, y) is not None:
+                continue
+            try:
+                write_tile(connection, zoom, x, y, fetch_upstream(zoom, x, y))
+                fetched += 1
+            except OSError as e:
+                failed += 1
+                print(f"  {zoom}/{x}/{y}: {e}")
+            time.sleep(args.delay)
+        print(f"zoom {zoom}: {len(tiles)} tiles, {fetched} fetched, {failed} failed")
+    exported = export_static_tiles(connection, args.static_dir)
+    connection.close()
+    print(f"Exported {exported} new tiles to {args.static_dir}")
+    print(f"Tile store: {args.output} ({os.path.getsize(args.output)} bytes)")
+
+if __name__ == "__main__":
+    main()